@@ -0,0 +1,364 @@
+"""Stand-in flag server for the flags2 examples.
+
+flags2_common.SERVERS expects flag servers on localhost ports 8001 (LOCAL),
+8002 (DELAY) and 8003 (ERROR). This module runs all of them in one process,
+on nothing but the standard library's asyncio streams, so the downloaders can
+be exercised and benchmarked offline.
+
+GET /flags/<cc>/<cc>.gif returns a small, valid GIF generated for the country
+code, padded to a realistic size. Codes missing from country_codes.txt are
+404, like on the real site. Each server can add:
+
+    - latency before every response, from a distribution: 'fixed:0.5' (or
+      just '0.5'), 'uniform:0.1,1', 'exp:0.5' (mean), 'lognormal:MU,SIGMA';
+    - a rate of 503 errors and a rate of spurious 404s;
+    - a bandwidth cap, in bytes per second per connection;
+    - a limit on connections served at once; later ones wait their turn.
+
+Connections are kept alive (HTTP/1.1), so pooled clients can reuse them.
+GET /stats returns the requests and connections served so far, as JSON, so a
+benchmark can tell whether a client really reused its connections.
+
+Sample run::
+
+    $ python3 flag_server.py
+    LOCAL serving on http://localhost:8001/flags (latency none)
+    DELAY serving on http://localhost:8002/flags (latency fixed:0.5)
+    ERROR serving on http://localhost:8003/flags (latency fixed:0.5, 25% errors)
+
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import os
+import random
+import re
+import struct
+import sys
+from urllib.parse import urlsplit
+
+from flags2_common import SERVERS
+
+
+# The server behaviour the examples were written against.
+SCENARIOS = {
+    'LOCAL': {},
+    'DELAY': {'latency': 'fixed:0.5'},
+    'ERROR': {'latency': 'fixed:0.5', 'error_rate': 0.25},
+}
+
+FLAG_SIZE = 4096
+CHUNK_SIZE = 4096
+COUNTRY_CODES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  os.pardir, 'concurrency_futures', 'flags2',
+                                  'country_codes.txt')
+
+FLAG_PATH_RE = re.compile(r'^/flags/([a-z]{2})/\1\.gif$')
+STATS_PATH = '/stats'
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+           405: 'Method Not Allowed', 503: 'Service Unavailable'}
+
+LATENCY_DISTRIBUTIONS = {
+    # name: (number of parameters, function of (rng, *parameters))
+    'fixed': (1, lambda rng, seconds: seconds),
+    'uniform': (2, lambda rng, low, high: rng.uniform(low, high)),
+    'exp': (1, lambda rng, mean: rng.expovariate(1 / mean)),
+    'lognormal': (2, lambda rng, mu, sigma: rng.lognormvariate(mu, sigma)),
+}
+
+
+def parse_latency(spec):
+    """Parse a latency spec like 'uniform:0.1,1' into (name, params)."""
+    if spec in (None, '', 'none', '0'):
+        return None
+    name, _, args = spec.partition(':')
+    try:
+        if not args:
+            name, args = 'fixed', name
+        params = tuple(float(arg) for arg in args.split(','))
+    except ValueError:
+        params = None
+    if (name not in LATENCY_DISTRIBUTIONS or params is None or
+            len(params) != LATENCY_DISTRIBUTIONS[name][0]):
+        msg = 'bad latency spec {!r}; expected one of: {}'
+        options = ', '.join('{}:{}'.format(n, ','.join(['X'] * count))
+                            for n, (count, _) in LATENCY_DISTRIBUTIONS.items())
+        raise ValueError(msg.format(spec, options))
+    return name, params
+
+
+def load_country_codes(path=COUNTRY_CODES_FILE):
+    """The codes that have a flag; None (every code) if the file is missing."""
+    try:
+        with open(path) as fp:
+            return frozenset(cc.lower() for cc in fp.read().split())
+    except FileNotFoundError:
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def make_flag(cc, size=FLAG_SIZE):
+    """A 1x1 GIF in a colour derived from cc, padded to about size bytes
+    with comment blocks, which image decoders skip."""
+    red, green, blue = (ord(c) * 37 % 256 for c in cc.upper() + 'X')
+    palette = bytes([red, green, blue, 255, 255, 255])
+    header = b'GIF89a' + struct.pack('<HHBBB', 1, 1, 0x80, 0, 0) + palette
+    image = (b',' + struct.pack('<HHHHB', 0, 0, 1, 1, 0) +
+             b'\x02\x02\x44\x01\x00' + b';')
+    padding = max(size - len(header) - len(image) - 3, 0)
+    comment = bytearray(b'\x21\xfe')
+    while padding > 0:
+        block = min(padding, 255)
+        comment.append(block)
+        comment.extend(cc.encode() * (block // 2) + b' ' * (block % 2))
+        padding -= block + 1
+    comment.append(0)
+    return header + bytes(comment) + image
+
+
+class FlagServer:
+
+    def __init__(self, label, port, host='localhost', latency=None,
+                 error_rate=0.0, not_found_rate=0.0, bandwidth=None,
+                 max_connections=None, flag_size=FLAG_SIZE, seed=None,
+                 country_codes=None):
+        self.label = label
+        self.host = host
+        self.port = port
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.not_found_rate = not_found_rate
+        self.bandwidth = bandwidth
+        self.flag_size = flag_size
+        self.country_codes = country_codes
+        self.rng = random.Random(seed)
+        self.max_connections = max_connections
+        self._slots = (asyncio.Semaphore(max_connections)
+                       if max_connections else None)
+        self._server = None
+        # Flag requests and client connections served, for GET /stats.
+        self.requests = 0
+        self.connections = 0
+
+    def describe(self):
+        if self.latency is None:
+            latency = 'none'
+        else:
+            name, params = self.latency
+            latency = '{}:{}'.format(name, ','.join(map(str, params)))
+        details = ['latency ' + latency]
+        if self.error_rate:
+            details.append('{:.0%} errors'.format(self.error_rate))
+        if self.not_found_rate:
+            details.append('{:.0%} extra 404s'.format(self.not_found_rate))
+        if self.bandwidth:
+            details.append('{} B/s'.format(self.bandwidth))
+        if self.max_connections:
+            details.append('{} connections max'.format(self.max_connections))
+        return '{} serving on http://{}:{}/flags ({})'.format(
+            self.label, self.host, self.port, ', '.join(details))
+
+    async def start(self):
+        self._server = await asyncio.start_server(self.handle, self.host,
+                                                  self.port)
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def delay(self):
+        if self.latency is None:
+            return 0
+        name, params = self.latency
+        return max(LATENCY_DISTRIBUTIONS[name][1](self.rng, *params), 0)
+
+    def respond(self, method, target):
+        """Return (status, body) for a request."""
+        if method not in ('GET', 'HEAD'):
+            return 405, b''
+        if self.rng.random() < self.error_rate:
+            return 503, REASONS[503].encode()
+        match = FLAG_PATH_RE.match(target)
+        if match is None:
+            return 404, b''
+        cc = match.group(1)
+        if self.country_codes is not None and cc not in self.country_codes:
+            return 404, b''
+        if self.rng.random() < self.not_found_rate:
+            return 404, b''
+        return 200, make_flag(cc, self.flag_size)
+
+    async def handle(self, reader, writer):
+        if self._slots is not None:
+            async with self._slots:
+                await self.serve_connection(reader, writer)
+        else:
+            await self.serve_connection(reader, writer)
+
+    def stats(self):
+        return json.dumps({'requests': self.requests,
+                           'connections': self.connections}).encode()
+
+    async def serve_connection(self, reader, writer):
+        self.connections += 1
+        try:
+            # One request after the other on the same connection, until the
+            # client closes it or asks us to.
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip().lower()
+                try:
+                    method, target, version = (
+                        request_line.decode('latin-1').split())
+                except ValueError:
+                    await self.send(writer, 400, b'', 'GET', False)
+                    break
+                connection = headers.get('connection', '')
+                if version == 'HTTP/1.0':
+                    keep_alive = connection == 'keep-alive'
+                else:
+                    keep_alive = connection != 'close'
+
+                if target == STATS_PATH:
+                    # Never delayed nor failed, and not counted.
+                    status, body = 200, self.stats()
+                    content_type = 'application/json'
+                else:
+                    self.requests += 1
+                    status, body = self.respond(method, target)
+                    content_type = None
+                    delay = self.delay()
+                    if delay:
+                        await asyncio.sleep(delay)
+                await self.send(writer, status, body, method, keep_alive,
+                                content_type)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def send(self, writer, status, body, method, keep_alive,
+                   content_type=None):
+        if content_type is None:
+            content_type = 'image/gif' if status == 200 else 'text/plain'
+        head = ('HTTP/1.1 {} {}\r\n'
+                'Content-Type: {}\r\n'
+                'Content-Length: {}\r\n'
+                'Connection: {}\r\n'
+                '\r\n').format(status, REASONS[status], content_type,
+                               len(body),
+                               'keep-alive' if keep_alive else 'close')
+        writer.write(head.encode('latin-1'))
+        if method == 'HEAD':
+            body = b''
+        if not self.bandwidth:
+            writer.write(body)
+            await writer.drain()
+            return
+        # Trickle the body out at no more than bandwidth bytes per second.
+        for start in range(0, len(body), CHUNK_SIZE):
+            chunk = body[start:start + CHUNK_SIZE]
+            writer.write(chunk)
+            await writer.drain()
+            await asyncio.sleep(len(chunk) / self.bandwidth)
+
+
+def make_servers(labels, **overrides):
+    """One FlagServer per label, on the port SERVERS gives it, configured
+    by its scenario and then by overrides that are not None."""
+    country_codes = load_country_codes()
+    servers = []
+    for label in labels:
+        options = dict(SCENARIOS.get(label, {}))
+        options.update((k, v) for k, v in overrides.items() if v is not None)
+        url = urlsplit(SERVERS[label])
+        servers.append(FlagServer(label, url.port, url.hostname,
+                                  country_codes=country_codes, **options))
+    return servers
+
+
+async def serve(servers):
+    for server in servers:
+        await server.start()
+        print(server.describe(), flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for server in servers:
+            await server.close()
+
+
+def process_args():
+    local = sorted((label for label, url in SERVERS.items()
+                    if urlsplit(url).hostname == 'localhost'),
+                   key=lambda label: urlsplit(SERVERS[label]).port)
+    parser = argparse.ArgumentParser(
+                description='Serve generated flags for the flags2 examples. '
+                'Options other than --servers override every scenario.')
+    parser.add_argument('--servers', metavar='LABELS',
+                default=','.join(local),
+                help='comma-separated labels to serve (default={})'
+                      .format(','.join(local)))
+    parser.add_argument('--latency', metavar='SPEC',
+                help='latency distribution, e.g. 0.5, uniform:0.1,1, '
+                     'exp:0.5 or lognormal:-1,0.5')
+    parser.add_argument('--error_rate', metavar='RATE', type=float,
+                help='fraction of requests answered with 503')
+    parser.add_argument('--not_found_rate', metavar='RATE', type=float,
+                help='fraction of valid flags answered with 404')
+    parser.add_argument('--bandwidth', metavar='BYTES', type=int,
+                help='bytes per second per connection')
+    parser.add_argument('--max_conn', metavar='N', type=int,
+                dest='max_connections',
+                help='connections served at once per server')
+    parser.add_argument('--size', metavar='BYTES', type=int,
+                dest='flag_size', help='flag size (default={})'
+                                       .format(FLAG_SIZE))
+    parser.add_argument('--seed', type=int,
+                help='random seed, for reproducible errors and latencies')
+    args = parser.parse_args()
+    labels = [label.strip().upper() for label in args.servers.split(',')]
+    unknown = [label for label in labels if label not in local]
+    if unknown:
+        print('*** Usage error: --servers must be among', ', '.join(local))
+        parser.print_usage()
+        sys.exit(1)
+    try:
+        parse_latency(args.latency)
+    except ValueError as exc:
+        print('*** Usage error:', exc)
+        parser.print_usage()
+        sys.exit(1)
+    overrides = vars(args)
+    del overrides['servers']
+    return labels, overrides
+
+
+def main():
+    labels, overrides = process_args()
+    servers = make_servers(labels, **overrides)
+    try:
+        asyncio.run(serve(servers))
+    except KeyboardInterrupt:
+        pass
+    for server in servers:
+        print('{}: {} requests, {} connections'.format(
+              server.label, server.requests, server.connections))
+
+
+if __name__ == '__main__':
+    main()
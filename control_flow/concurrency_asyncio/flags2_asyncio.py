@@ -12,32 +12,64 @@ from flags2_common import main, HTTPStatus, Result, save_flag
 DEFAULT_CONCUR_REQ = 5
 MAX_CONCUR_REQ = 1000
 
+# Connector defaults, overridable from the command line.
+DNS_TTL = 10
+KEEPALIVE_TIMEOUT = 15
+
 class FetchError(Exception):
     def __init__(self, country_code):
         self.country_code = country_code
 
+def add_connector_options(parser):
+    parser.add_argument('--per_host', metavar='N', type=int, default=None,
+                help='maximum connections per host '
+                     '(default: same as --max_req)')
+    parser.add_argument('--dns_ttl', metavar='SECONDS', type=int,
+                default=DNS_TTL,
+                help='cache DNS lookups for SECONDS (default={})'
+                      .format(DNS_TTL))
+    parser.add_argument('--keepalive', metavar='SECONDS', type=float,
+                default=KEEPALIVE_TIMEOUT,
+                help='close idle connections after SECONDS (default={})'
+                      .format(KEEPALIVE_TIMEOUT))
+    return ['per_host', 'dns_ttl', 'keepalive']
+
+# The connector owns the pool of kept-alive connections and the DNS cache.
+# Its limits come from concur_req, so the pool never holds more connections
+# than the semaphore lets requests run at once.
+def make_connector(concur_req, per_host=None, dns_ttl=DNS_TTL,
+                   keepalive=KEEPALIVE_TIMEOUT):
+    return aiohttp.TCPConnector(limit=concur_req,
+                                limit_per_host=per_host or concur_req,
+                                ttl_dns_cache=dns_ttl,
+                                keepalive_timeout=keepalive)
+
 @asyncio.coroutine
-def get_flag(base_url, cc):
+def get_flag(session, base_url, cc):
     url = '{}/{cc}/{cc}.gif'.format(base_url, cc=cc.lower())
-    resp = yield from aiohttp.request('GET', url)
-    if resp.status == 200:
-        image = yield from resp.read()
-        return image
-    elif resp.status == 404:
-        raise web.HTTPNotFound()
-    else:
-        raise aiohttp.HttpProcessingError(
-                code=resp.status, message=resp.reason,
-                headers=resp.headers)
+    resp = yield from session.get(url)
+    try:
+        if resp.status == 200:
+            image = yield from resp.read()
+            return image
+        elif resp.status == 404:
+            raise web.HTTPNotFound()
+        else:
+            raise aiohttp.HttpProcessingError(
+                    code=resp.status, message=resp.reason,
+                    headers=resp.headers)
+    finally:
+        # Hand the connection back to the pool, even after an error status.
+        resp.release()
 
 @asyncio.coroutine
-def download_one(cc, base_url, semaphore, verbose):
+def download_one(session, cc, base_url, semaphore, verbose):
     try:
 
         # Ensure that no more than concur_req instances of get_flags coroutines
         # will be started at any time.
         with (yield from semaphore):
-            image = yield from get_flag(base_url, cc)
+            image = yield from get_flag(session, base_url, cc)
 
     except web.HTTPNotFound:
         status = HTTPStatus.not_found
@@ -55,14 +87,27 @@ def download_one(cc, base_url, semaphore, verbose):
     return Result(status, cc)
 
 @asyncio.coroutine
-def downloader_coro(cc_list, base_url, verbose, concur_req):
+def downloader_coro(cc_list, base_url, verbose, concur_req,
+                    **connector_options):
+    # One session for the whole run: every download reuses its connections.
+    session = aiohttp.ClientSession(
+        connector=make_connector(concur_req, **connector_options))
+    try:
+        counter = yield from download_all(session, cc_list, base_url,
+                                          verbose, concur_req)
+    finally:
+        yield from session.close()
+    return counter
+
+@asyncio.coroutine
+def download_all(session, cc_list, base_url, verbose, concur_req):
     counter = collections.Counter()
 
     # Create an asyncio.Semaphore.
     semaphore = asyncio.Semaphore(concur_req)
 
     # Create a list of coroutine objects, one per call to 'download_one' coroutine.
-    to_do = [download_one(cc, base_url, semaphore, verbose)
+    to_do = [download_one(session, cc, base_url, semaphore, verbose)
              for cc in sorted(cc_list)]
 
     # Get an iterator that will return futures as they are done.
@@ -95,9 +140,11 @@ def downloader_coro(cc_list, base_url, verbose, concur_req):
 
     return counter
 
-def download_many(cc_list, base_url, verbose, concur_req):
+def download_many(cc_list, base_url, verbose, concur_req,
+                  **connector_options):
     loop = asyncio.get_event_loop()
-    coro = downloader_coro(cc_list, base_url, verbose, concur_req)
+    coro = downloader_coro(cc_list, base_url, verbose, concur_req,
+                           **connector_options)
     counts = loop.run_until_complete(coro)
     loop.close()
 
@@ -105,4 +152,5 @@ def download_many(cc_list, base_url, verbose, concur_req):
 
 
 if __name__ == '__main__':
-    main(download_many, DEFAULT_CONCUR_REQ, MAX_CONCUR_REQ)
+    main(download_many, DEFAULT_CONCUR_REQ, MAX_CONCUR_REQ,
+         add_connector_options)
@@ -1,44 +1,89 @@
 import asyncio
 import collections
-import concurrent
+from concurrent import futures
 
 import aiohttp
 from aiohttp import web
 import tqdm
 
 from flags2_common import main, HTTPStatus, Result, save_flag
+from flags2_asyncio import add_connector_options, make_connector, get_flag
 
 # default set low to avoid errors from remote site, such as
 # 503 - Service Temporarily Unavailable
 DEFAULT_CONCUR_REQ = 5
 MAX_CONCUR_REQ = 1000
 
+# Threads writing flags to disk, and flags that may wait for them in memory.
+DEFAULT_WRITERS = 5
+DEFAULT_WRITE_QUEUE = 50
+
 class FetchError(Exception):
     def __init__(self, country_code):
         self.country_code = country_code
 
-@asyncio.coroutine
-def get_flag(base_url, cc):
-    url = '{}/{cc}/{cc}.gif'.format(base_url, cc=cc.lower())
-    resp = yield from aiohttp.request('GET', url)
-    if resp.status == 200:
-        image = yield from resp.read()
-        return image
-    elif resp.status == 404:
-        raise web.HTTPNotFound()
-    else:
-        raise aiohttp.HttpProcessingError(
-                code=resp.status, message=resp.reason,
-                headers=resp.headers)
+def add_options(parser):
+    names = add_connector_options(parser)
+    parser.add_argument('--writers', metavar='N', type=int,
+                default=DEFAULT_WRITERS,
+                help='threads writing flags to disk (default={})'
+                      .format(DEFAULT_WRITERS))
+    parser.add_argument('--write_queue', metavar='N', type=int,
+                default=DEFAULT_WRITE_QUEUE,
+                help='downloaded flags waiting to be written (default={})'
+                      .format(DEFAULT_WRITE_QUEUE))
+    return names + ['writers', 'write_queue']
+
+class FlagWriter:
+    """The disk-writing stage: a bounded queue drained by a fixed pool of
+    writer threads, created once per run.
+
+    put() waits while the queue is full, so downloads slow down to the pace
+    of the disk instead of piling images up in memory. drain() waits until
+    every queued flag is written, then stops the writers.
+    """
+
+    def __init__(self, writers=DEFAULT_WRITERS, maxsize=DEFAULT_WRITE_QUEUE):
+        self.queue = asyncio.Queue(maxsize)
+        self.executor = futures.ThreadPoolExecutor(writers)
+        # (country code, exception) for every flag that could not be saved.
+        self.failures = []
+        self.tasks = [asyncio.ensure_future(self.write_loop())
+                      for _ in range(writers)]
+
+    @asyncio.coroutine
+    def put(self, cc, image):
+        yield from self.queue.put((cc, image))
+
+    @asyncio.coroutine
+    def write_loop(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            cc, image = yield from self.queue.get()
+            try:
+                yield from loop.run_in_executor(self.executor, save_flag,
+                                                image, cc.lower() + '.gif')
+            except Exception as exc:
+                self.failures.append((cc, exc))
+            finally:
+                self.queue.task_done()
+
+    @asyncio.coroutine
+    def drain(self):
+        yield from self.queue.join()
+        for task in self.tasks:
+            task.cancel()
+        yield from asyncio.gather(*self.tasks, return_exceptions=True)
+        self.executor.shutdown(wait=True)
 
 @asyncio.coroutine
-def download_one(cc, base_url, semaphore, verbose):
+def download_one(session, writer, cc, base_url, semaphore, verbose):
     try:
 
         # Ensure that no more than concur_req instances of get_flags coroutines
         # will be started at any time.
         with (yield from semaphore):
-            image = yield from get_flag(base_url, cc)
+            image = yield from get_flag(session, base_url, cc)
 
     except web.HTTPNotFound:
         status = HTTPStatus.not_found
@@ -46,28 +91,9 @@ def download_one(cc, base_url, semaphore, verbose):
     except Exception as exc:
         raise FetchError(cc) from exc
     else:
-
-        '''
-        exception calling callback for <Future at 0x7f0ba2434710 state=finished returned NoneType>
-        Traceback (most recent call last):
-        File "/usr/lib/python3.5/concurrent/futures/_base.py", line 297, in _invoke_callbacks
-            callback(self)
-        File "/usr/lib/python3.5/asyncio/futures.py", line 442, in _call_set_state
-            dest_loop.call_soon_threadsafe(_set_state, destination, source)
-        File "/usr/lib/python3.5/asyncio/base_events.py", line 532, in call_soon_threadsafe
-            handle = self._call_soon(callback, args)
-        File "/usr/lib/python3.5/asyncio/base_events.py", line 506, in _call_soon
-            self._check_closed()
-        File "/usr/lib/python3.5/asyncio/base_events.py", line 334, in _check_closed
-            raise RuntimeError('Event loop is closed')
-        RuntimeError: Event loop is closed
-        '''
-        # Bug filed at https://github.com/python/asyncio/issues/258
-        # Workaround at https://stackoverflow.com/questions/32598231/asyncio-runtimeerror-event-loop-is-closed
-        loop = asyncio.get_event_loop()
-        executor = concurrent.futures.ThreadPoolExecutor(5)
-        loop.set_default_executor(executor)
-        loop.run_in_executor(None, save_flag, image, cc.lower() + '.gif')
+        # Saving happens in the writer stage (see FlagWriter), which
+        # downloader_coro drains before the loop closes.
+        yield from writer.put(cc, image)
         status = HTTPStatus.ok
         msg = 'OK'
 
@@ -77,14 +103,38 @@ def download_one(cc, base_url, semaphore, verbose):
     return Result(status, cc)
 
 @asyncio.coroutine
-def downloader_coro(cc_list, base_url, verbose, concur_req):
+def downloader_coro(cc_list, base_url, verbose, concur_req,
+                    writers=DEFAULT_WRITERS, write_queue=DEFAULT_WRITE_QUEUE,
+                    **connector_options):
+    # One session for the whole run: every download reuses its connections.
+    session = aiohttp.ClientSession(
+        connector=make_connector(concur_req, **connector_options))
+    writer = FlagWriter(writers, write_queue)
+    try:
+        counter = yield from download_all(session, writer, cc_list, base_url,
+                                          verbose, concur_req)
+    finally:
+        # Every flag reported as downloaded is on disk before we return.
+        yield from writer.drain()
+        yield from session.close()
+
+    # A flag that could not be saved is an error, not a download.
+    for cc, exc in writer.failures:
+        counter[HTTPStatus.ok] -= 1
+        counter[HTTPStatus.error] += 1
+        if verbose:
+            print('*** Error saving {}: {}'.format(cc, exc))
+    return counter
+
+@asyncio.coroutine
+def download_all(session, writer, cc_list, base_url, verbose, concur_req):
     counter = collections.Counter()
 
     # Create an asyncio.Semaphore.
     semaphore = asyncio.Semaphore(concur_req)
 
     # Create a list of coroutine objects, one per call to 'download_one' coroutine.
-    to_do = [download_one(cc, base_url, semaphore, verbose)
+    to_do = [download_one(session, writer, cc, base_url, semaphore, verbose)
              for cc in sorted(cc_list)]
 
     # Get an iterator that will return futures as they are done.
@@ -117,9 +167,9 @@ def downloader_coro(cc_list, base_url, verbose, concur_req):
 
     return counter
 
-def download_many(cc_list, base_url, verbose, concur_req):
+def download_many(cc_list, base_url, verbose, concur_req, **options):
     loop = asyncio.get_event_loop()
-    coro = downloader_coro(cc_list, base_url, verbose, concur_req)
+    coro = downloader_coro(cc_list, base_url, verbose, concur_req, **options)
     counts = loop.run_until_complete(coro)
     loop.close()
 
@@ -127,4 +177,4 @@ def download_many(cc_list, base_url, verbose, concur_req):
 
 
 if __name__ == '__main__':
-    main(download_many, DEFAULT_CONCUR_REQ, MAX_CONCUR_REQ)
+    main(download_many, DEFAULT_CONCUR_REQ, MAX_CONCUR_REQ, add_options)
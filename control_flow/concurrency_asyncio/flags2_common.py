@@ -87,7 +87,10 @@ def expand_cc_args(every_cc, all_cc, cc_args, limit):
     return sorted(codes)[:limit]
 
 
-def process_args(default_concur_req):
+# add_options, if given, is called with the parser to add options specific
+# to one downloader; it returns the names of the options it added, which
+# main() passes on to download_many as keyword arguments.
+def process_args(default_concur_req, add_options=None):
     server_options = ', '.join(sorted(SERVERS))
     parser = argparse.ArgumentParser(
                 description='Download flags for country codes. '
@@ -110,7 +113,9 @@ def process_args(default_concur_req):
                       .format(server_options, DEFAULT_SERVER))
     parser.add_argument('-v', '--verbose', action='store_true',
                 help='output detailed progress info')
+    extra_options = add_options(parser) if add_options else []
     args = parser.parse_args()
+    args.extra = {name: getattr(args, name) for name in extra_options}
     if args.max_req < 1:
         print('*** Usage error: --max_req CONCURRENT must be >= 1')
         parser.print_usage()
@@ -137,13 +142,15 @@ def process_args(default_concur_req):
     return args, cc_list
 
 
-def main(download_many, default_concur_req, max_concur_req):
-    args, cc_list = process_args(default_concur_req)
+def main(download_many, default_concur_req, max_concur_req,
+         add_options=None):
+    args, cc_list = process_args(default_concur_req, add_options)
     actual_req = min(args.max_req, max_concur_req, len(cc_list))
     initial_report(cc_list, actual_req, args.server)
     base_url = SERVERS[args.server]
     t0 = time.time()
-    counter = download_many(cc_list, base_url, args.verbose, actual_req)
+    counter = download_many(cc_list, base_url, args.verbose, actual_req,
+                            **args.extra)
     assert sum(counter.values()) == len(cc_list), \
         'some downloads are unaccounted for'
     final_report(cc_list, counter, t0)
@@ -0,0 +1,399 @@
+"""Benchmark every download_many implementation against local flag servers.
+
+Each measurement runs in a fresh Python process, so that imports, thread pools
+and event loops of one implementation can't affect another, and so that CPU
+time and peak memory are those of a single run. The worker process:
+
+    - imports the implementation from its own directory, in a temporary
+      working directory (flags are saved to its downloads/);
+    - points it at the local server and sets the concurrency level;
+    - wraps the module's get_flag to time every request;
+    - calls download_many and reports wall time, request latencies, CPU time
+      and peak RSS as JSON.
+
+The runner starts flag_server.py, sweeps implementations, servers, code-list
+sizes and concurrency levels, repeats every combination, and prints a table.
+-o results.json or -o results.csv also saves it.
+
+Sample run::
+
+    $ python3 flags_bench.py --sizes 20 100 --concurrency 1 10 --repeat 3
+
+Throughput and CPU time are medians over the repeats; latency percentiles
+are over all the requests of all the repeats; peak RSS is the maximum.
+conns is the median number of connections the flag server accepted per run:
+about one per request without keep-alive, at most the concurrency with it.
+"""
+
+import argparse
+import collections
+import contextlib
+import csv
+import importlib
+import inspect
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+import urllib.request
+from urllib.parse import urlsplit
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
+from flag_server import STATS_PATH
+from flags2_common import SERVERS
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FUTURES_DIR = os.path.join(HERE, os.pardir, 'concurrency_futures')
+COUNTRY_CODES_FILE = os.path.join(FUTURES_DIR, 'flags2', 'country_codes.txt')
+
+# style: 'flags1' modules take download_many(cc_list) and read BASE_URL;
+#   'flags2' modules take download_many(cc_list, base_url, verbose, concur).
+# concurrency: 'param' follows the sweep, 'sequential' is always 1 and
+#   'unbounded' starts every download at once.
+Implementation = collections.namedtuple(
+    'Implementation', 'name path style concurrency patch')
+
+# Variants without keep-alive sessions, to measure what pooling brings.
+# flags2_threadpool imports make_session by name, so it has its own binding
+#   to replace besides the one in flags2_sequential. The conns column of the
+#   table shows whether the patch took: one connection per request.
+def _no_pool(module):
+    import requests
+    import flags2_sequential
+    no_session = lambda pool_size=1: contextlib.nullcontext(requests)
+    flags2_sequential.make_session = no_session
+    module.make_session = no_session
+
+IMPLEMENTATIONS = [
+    Implementation('flags', 'concurrency_futures/flags1/flags.py',
+                   'flags1', 'sequential', None),
+    Implementation('flags_threadpool',
+                   'concurrency_futures/flags1/flags_threadpool.py',
+                   'flags1', 'param', None),
+    Implementation('flags_asyncio', 'concurrency_asyncio/flags_asyncio.py',
+                   'flags1', 'unbounded', None),
+    Implementation('flags2_sequential',
+                   'concurrency_futures/flags2/flags2_sequential.py',
+                   'flags2', 'sequential', None),
+    Implementation('flags2_sequential_nopool',
+                   'concurrency_futures/flags2/flags2_sequential.py',
+                   'flags2', 'sequential', _no_pool),
+    Implementation('flags2_threadpool',
+                   'concurrency_futures/flags2/flags2_threadpool.py',
+                   'flags2', 'param', None),
+    Implementation('flags2_threadpool_nopool',
+                   'concurrency_futures/flags2/flags2_threadpool.py',
+                   'flags2', 'param', _no_pool),
+    Implementation('flags2_asyncio', 'concurrency_asyncio/flags2_asyncio.py',
+                   'flags2', 'param', None),
+    Implementation('flags2_asyncio_executor',
+                   'concurrency_asyncio/flags2_asyncio_executor.py',
+                   'flags2', 'param', None),
+]
+BY_NAME = {impl.name: impl for impl in IMPLEMENTATIONS}
+
+FIELDS = ['implementation', 'server', 'codes', 'concurrency', 'runs',
+          'errors', 'flags_per_s', 'p50_ms', 'p99_ms', 'cpu_s',
+          'peak_rss_mb', 'connections']
+
+
+def cc_list(size):
+    """The first size codes: real ones first, then made-up ones (404s)."""
+    with open(COUNTRY_CODES_FILE) as fp:
+        codes = sorted(fp.read().split())
+    if size > len(codes):
+        letters = [chr(c) for c in range(ord('A'), ord('Z') + 1)]
+        known = set(codes)
+        codes += [a + b for a in letters for b in letters
+                  if a + b not in known]
+    return codes[:size]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return math.nan
+    rank = max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+def peak_rss_mb():
+    if resource is None:
+        return math.nan
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def timed(func, latencies):
+    """Wrap func, plain or coroutine, appending each call's duration."""
+    if inspect.iscoroutinefunction(func):
+        async def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                latencies.append(time.perf_counter() - t0)
+    elif inspect.isgeneratorfunction(func):
+        # Generator-based coroutines, as written with @asyncio.coroutine.
+        @types.coroutine
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return (yield from func(*args, **kwargs))
+            finally:
+                latencies.append(time.perf_counter() - t0)
+    else:
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                latencies.append(time.perf_counter() - t0)
+    return wrapper
+
+
+def run_worker(name, base_url, size, concurrency):
+    """Run one measurement in this process and return it as a dict."""
+    impl = BY_NAME[name]
+    path = os.path.normpath(os.path.join(HERE, os.pardir, impl.path))
+    sys.path.insert(0, os.path.dirname(path))
+    module = importlib.import_module(
+        os.path.splitext(os.path.basename(path))[0])
+    if impl.patch is not None:
+        impl.patch(module)
+
+    # get_flag is looked up in the globals of the function that calls it,
+    # which may be another module than the one we imported.
+    caller = getattr(module, 'download_one', module.download_many)
+    namespace = caller.__globals__
+    latencies = []
+    get_flag = namespace['get_flag']
+    namespace['get_flag'] = timed(get_flag, latencies)
+
+    codes = cc_list(size)
+    if impl.concurrency == 'sequential':
+        concurrency = 1
+    elif impl.concurrency == 'unbounded':
+        concurrency = len(codes)
+    if impl.style == 'flags1':
+        get_flag.__globals__['BASE_URL'] = base_url
+        if 'MAX_WORKERS' in vars(module):
+            module.MAX_WORKERS = concurrency
+        call = lambda: module.download_many(codes)
+    else:
+        actual_req = min(concurrency, module.MAX_CONCUR_REQ, len(codes))
+        concurrency = actual_req
+        call = lambda: module.download_many(codes, base_url, False,
+                                            actual_req)
+
+    cpu0 = time.process_time()
+    t0 = time.perf_counter()
+    result = call()
+    elapsed = time.perf_counter() - t0
+    cpu = time.process_time() - cpu0
+    if isinstance(result, collections.Counter):
+        result = {status.name: count for status, count in result.items()}
+    return {'elapsed': elapsed, 'cpu': cpu, 'peak_rss_mb': peak_rss_mb(),
+            'latencies': latencies, 'concurrency': concurrency,
+            'result': result}
+
+
+def worker_main(args):
+    # Progress bars and flag codes go to /dev/null; the report goes to the
+    # real stdout.
+    report = os.fdopen(os.dup(1), 'w')
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        os.mkdir('downloads')
+        try:
+            measurement = run_worker(args.name, args.base_url, args.size,
+                                     args.concurrency)
+        except BaseException as exc:
+            measurement = {'error': '{}: {}'.format(type(exc).__name__, exc)}
+    json.dump(measurement, report)
+    report.close()
+
+
+def server_connections(base_url):
+    """Connections the flag server has accepted so far, or None if it
+    doesn't say (not one of ours)."""
+    url = urlsplit(base_url)
+    try:
+        with urllib.request.urlopen('{}://{}{}'.format(
+                url.scheme, url.netloc, STATS_PATH), timeout=5) as resp:
+            return json.load(resp)['connections']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def measure(name, base_url, size, concurrency, timeout):
+    cmd = [sys.executable, os.path.abspath(__file__), '--worker', name,
+           base_url, str(size), str(concurrency)]
+    before = server_connections(base_url)
+    try:
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, timeout=timeout,
+                              cwd=HERE)
+    except subprocess.TimeoutExpired:
+        return {'error': 'timed out after {}s'.format(timeout)}
+    after = server_connections(base_url)
+    try:
+        measurement = json.loads(proc.stdout)
+    except ValueError:
+        return {'error': 'worker exited with status {}'.format(
+                proc.returncode)}
+    # The second query opened a connection of its own.
+    if before is not None and after is not None:
+        measurement['connections'] = after - before - 1
+    return measurement
+
+
+def summarize(impl, label, size, concurrency, runs):
+    ok = [run for run in runs if 'error' not in run]
+    row = {'implementation': impl.name, 'server': label, 'codes': size,
+           'concurrency': concurrency, 'runs': len(ok),
+           'errors': len(runs) - len(ok)}
+    if not ok:
+        row['error'] = runs[0]['error']
+        return row
+    latencies = sorted(lat for run in ok for lat in run['latencies'])
+    row.update(
+        concurrency=ok[0]['concurrency'],
+        flags_per_s=statistics.median(size / run['elapsed'] for run in ok),
+        p50_ms=percentile(latencies, 50) * 1000,
+        p99_ms=percentile(latencies, 99) * 1000,
+        cpu_s=statistics.median(run['cpu'] for run in ok),
+        peak_rss_mb=max(run['peak_rss_mb'] for run in ok))
+    connections = [run['connections'] for run in ok if 'connections' in run]
+    row['connections'] = (statistics.median(connections) if connections
+                          else math.nan)
+    return row
+
+
+def sweep(names, labels, sizes, levels, repeat, timeout):
+    for name in names:
+        impl = BY_NAME[name]
+        impl_levels = levels if impl.concurrency == 'param' else [None]
+        for label in labels:
+            for size in sizes:
+                for level in impl_levels:
+                    runs = [measure(name, SERVERS[label], size, level or 1,
+                                    timeout)
+                            for _ in range(repeat)]
+                    yield summarize(impl, label, size, level, runs)
+
+
+def format_row(row):
+    if 'error' in row:
+        return '{implementation:>25} {server:>6} {codes:>5}  {error}'.format(
+               **row)
+    return ('{implementation:>25} {server:>6} {codes:>5} {concurrency:>5} '
+            '{flags_per_s:>9.1f} {p50_ms:>8.1f} {p99_ms:>8.1f} {cpu_s:>7.2f} '
+            '{peak_rss_mb:>8.1f} {connections:>6.0f}').format(**row)
+
+
+def save(rows, path):
+    if path.endswith('.csv'):
+        with open(path, 'w', newline='') as fp:
+            writer = csv.DictWriter(fp, FIELDS + ['error'],
+                                    extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(path, 'w') as fp:
+            json.dump(rows, fp, indent=2)
+
+
+@contextlib.contextmanager
+def flag_server(labels, seed):
+    """Run flag_server.py for the given labels until the block exits."""
+    cmd = [sys.executable, os.path.join(HERE, 'flag_server.py'),
+           '--servers', ','.join(labels), '--seed', str(seed)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, cwd=HERE,
+                            universal_newlines=True)
+    try:
+        # One line per server once it is listening.
+        for _ in labels:
+            line = proc.stdout.readline()
+            if not line:
+                raise RuntimeError('flag_server.py exited with status '
+                                   '{}'.format(proc.wait()))
+            print(line, end='')
+        yield
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def process_args():
+    local = [label for label in SERVERS if label != 'REMOTE']
+    parser = argparse.ArgumentParser(
+                description='Compare download_many implementations '
+                            'against local flag servers.')
+    parser.add_argument('--only', metavar='NAME', nargs='+',
+                choices=list(BY_NAME), default=list(BY_NAME),
+                help='implementations to run (default: all)')
+    parser.add_argument('--servers', metavar='LABEL', nargs='+',
+                choices=local, default=['LOCAL'],
+                help='servers to hit, among {} (default: LOCAL)'
+                      .format(', '.join(local)))
+    parser.add_argument('--sizes', metavar='N', type=int, nargs='+',
+                default=[20, 100], help='numbers of codes (default: 20 100)')
+    parser.add_argument('--concurrency', metavar='N', type=int, nargs='+',
+                default=[1, 10, 50],
+                help='concurrency levels (default: 1 10 50)')
+    parser.add_argument('--repeat', metavar='N', type=int, default=3,
+                help='runs per combination (default: 3)')
+    parser.add_argument('--timeout', metavar='SECONDS', type=float,
+                default=600, help='limit for a single run (default: 600)')
+    parser.add_argument('--no_server', action='store_true',
+                help='use servers that are already running')
+    parser.add_argument('--seed', type=int, default=0,
+                help='flag server random seed (default: 0)')
+    parser.add_argument('-o', '--output', metavar='PATH',
+                help='save the table as JSON, or as CSV if PATH ends '
+                     'with .csv')
+    return parser.parse_args()
+
+
+def main():
+    args = process_args()
+    server = (contextlib.nullcontext() if args.no_server
+              else flag_server(args.servers, args.seed))
+    rows = []
+    with server:
+        print('{:>25} {:>6} {:>5} {:>5} {:>9} {:>8} {:>8} {:>7} {:>8} '
+              '{:>6}'.format('implementation', 'server', 'codes', 'conc',
+                             'flags/s', 'p50 ms', 'p99 ms', 'cpu s',
+                             'rss MB', 'conns'))
+        for row in sweep(args.only, args.servers, args.sizes,
+                         args.concurrency, args.repeat, args.timeout):
+            print(format_row(row), flush=True)
+            rows.append(row)
+    if args.output:
+        save(rows, args.output)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--worker']:
+        parser = argparse.ArgumentParser()
+        parser.add_argument('--worker', dest='name')
+        parser.add_argument('base_url')
+        parser.add_argument('size', type=int)
+        parser.add_argument('concurrency', type=int)
+        worker_main(parser.parse_args())
+    else:
+        main()
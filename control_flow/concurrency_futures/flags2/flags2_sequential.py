@@ -18,6 +18,7 @@ Sample run::
 import collections
 
 import requests
+import requests.adapters
 import tqdm
 
 from flags2_common import main, save_flag, HTTPStatus, Result
@@ -26,18 +27,30 @@ from flags2_common import main, save_flag, HTTPStatus, Result
 DEFAULT_CONCUR_REQ = 1
 MAX_CONCUR_REQ = 1
 
+# A Session keeps connections alive between requests, so only the first
+#   download from a host pays for the TCP handshake. Its adapter keeps up to
+#   pool_size idle connections, one per thread that may use it at once.
+def make_session(pool_size=1):
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1,
+                                            pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
 # BEGIN FLAGS2_BASIC_HTTP_FUNCTIONS
-def get_flag(base_url, cc):
+def get_flag(base_url, cc, session=requests):
     url = '{}/{cc}/{cc}.gif'.format(base_url, cc=cc.lower())
-    resp = requests.get(url)
+    resp = session.get(url)
     if resp.status_code != 200:  # <1>
         resp.raise_for_status()
     return resp.content
 
 
-def download_one(cc, base_url, verbose=False):
+def download_one(cc, base_url, verbose=False, session=requests):
     try:
-        image = get_flag(base_url, cc)
+        image = get_flag(base_url, cc, session)
     except requests.exceptions.HTTPError as exc:  # <2>
         res = exc.response
         if res.status_code == 404:
@@ -62,23 +75,24 @@ def download_many(cc_list, base_url, verbose, max_req):
     cc_iter = sorted(cc_list)  # <2>
     if not verbose:
         cc_iter = tqdm.tqdm(cc_iter)  # <3>
-    for cc in cc_iter:  # <4>
-        try:
-            res = download_one(cc, base_url, verbose)  # <5>
-        except requests.exceptions.HTTPError as exc:  # <6>
-            error_msg = 'HTTP error {res.status_code} - {res.reason}'
-            error_msg = error_msg.format(res=exc.response)
-        except requests.exceptions.ConnectionError as exc:  # <7>
-            error_msg = 'Connection error'
-        else:  # <8>
-            error_msg = ''
-            status = res.status
-
-        if error_msg:
-            status = HTTPStatus.error  # <9>
-        counter[status] += 1  # <10>
-        if verbose and error_msg: # <11>
-            print('*** Error for {}: {}'.format(cc, error_msg))
+    with make_session(max_req) as session:
+        for cc in cc_iter:  # <4>
+            try:
+                res = download_one(cc, base_url, verbose, session)  # <5>
+            except requests.exceptions.HTTPError as exc:  # <6>
+                error_msg = 'HTTP error {res.status_code} - {res.reason}'
+                error_msg = error_msg.format(res=exc.response)
+            except requests.exceptions.ConnectionError as exc:  # <7>
+                error_msg = 'Connection error'
+            else:  # <8>
+                error_msg = ''
+                status = res.status
+
+            if error_msg:
+                status = HTTPStatus.error  # <9>
+            counter[status] += 1  # <10>
+            if verbose and error_msg: # <11>
+                print('*** Error for {}: {}'.format(cc, error_msg))
 
     return counter  # <12>
 # END FLAGS2_DOWNLOAD_MANY_SEQUENTIAL
@@ -5,14 +5,20 @@ import requests
 import tqdm
 
 from flags2_common import main, HTTPStatus
-from flags2_sequential import download_one
+from flags2_sequential import download_one, make_session
 
 DEFAULT_CONCUR_REQ = 30
 MAX_CONCUR_REQ = 1000
 
 def download_many(cc_list, base_url, verbose, concur_req):
     counter = collections.Counter()
-    with futures.ThreadPoolExecutor(max_workers=concur_req) as executor:
+
+    # One Session for all the workers, with a connection pool as large as
+    # the number of threads: every worker gets a kept-alive connection back
+    # from the pool instead of opening a new one per flag. The pool itself
+    # is thread-safe, and these plain GETs change no other session state.
+    with make_session(concur_req) as session, \
+            futures.ThreadPoolExecutor(max_workers=concur_req) as executor:
 
         # The dict will map each Future instance to the respective country code.
         to_do_map = {}
@@ -21,7 +27,8 @@ def download_many(cc_list, base_url, verbose, concur_req):
         for cc in sorted(cc_list):
 
             # Schedule the execution of one callable and returns an instance.
-            future = executor.submit(download_one, cc, base_url, verbose)
+            future = executor.submit(download_one, cc, base_url, verbose,
+                                     session)
             to_do_map[future] = cc
 
         done_iter = futures.as_completed(to_do_map)
@@ -5,19 +5,82 @@ import numbers
 import functools
 import operator
 import itertools
+import struct
+import bisect
+import weakref
+
+# Floating point typecodes a Vector may use, from narrowest to widest.
+#   'f' (float32) halves the memory of the default 'd' (float64).
+TYPECODES = ('f', 'd')
+
+
+# Arithmetic between two typecodes gives the wider one, like float32 and
+#   float64 in numpy.
+def promote(typecode, other_typecode):
+    return max(typecode, other_typecode, key=TYPECODES.index)
+
 
 class Vector:
     typecode = 'd'
 
-    def __init__(self, components):
-        self._components = array(self.typecode, components)
+    def __init__(self, components, typecode=None):
+        self.typecode = self._typecode_for(components, typecode)
+        if (isinstance(components, memoryview) and components.contiguous
+                and components.format == self.typecode):
+            # array() would iterate over the memoryview, boxing every item;
+            #   frombytes() copies the raw buffer in one go.
+            self._components = array(self.typecode)
+            self._components.frombytes(components.cast('B'))
+        else:
+            self._components = array(self.typecode, components)
+
+    # Without an explicit typecode, a Vector built from another Vector, an
+    #   array or a memoryview keeps its precision; anything else gets the
+    #   class default.
+    @classmethod
+    def _typecode_for(cls, components, typecode=None):
+        if typecode is None:
+            typecode = getattr(components, 'typecode', None)
+            if typecode is None and isinstance(components, memoryview):
+                typecode = components.format
+            if typecode not in TYPECODES:
+                typecode = cls.typecode
+        elif typecode not in TYPECODES:
+            msg = 'typecode must be one of {!r}, not {!r}'
+            raise ValueError(msg.format(TYPECODES, typecode))
+        return typecode
 
     def __iter__(self):
         return iter(self._components)
 
+    # Alternative constructor sharing an existing buffer (e.g. a memoryview
+    #   slice) instead of copying it into a new array. Used for slices, for
+    #   frombytes(..., copy=False) and for the row views of a VectorBatch.
+    @classmethod
+    def _fromview(cls, memv):
+        vec = cls.__new__(cls)
+        vec.typecode = memv.format
+        vec._components = memv
+        return vec
+
+    # A view keeps its whole source buffer alive. copy() returns a Vector
+    #   owning a compact array with just its own components.
+    def copy(self):
+        return type(self)(self._components)
+
+    # A memoryview cannot be pickled, so pickle (and copy.deepcopy) rebuild
+    #   every Vector from a compact array of its own components. A view then
+    #   arrives as an owned copy, without the rest of its source buffer.
+    def __reduce__(self):
+        return type(self), (array(self.typecode, self._components),)
+
     def __repr__(self):
-        components = reprlib.repr(self._components)
+        # reprlib only shows the first few items, so there is no point in
+        #   handing it more. This also works when _components is a memoryview.
+        components = reprlib.repr(array(self.typecode, self._components[:6]))
         components = components[components.find('['):-1]
+        if self.typecode != Vector.typecode:
+            components += ', typecode={!r}'.format(self.typecode)
         return 'Vector({})'.format(components)
 
     def __str__(self):
@@ -48,6 +111,7 @@ class Vector:
         return True
     '''
 
+    '''
     # Same logic as above, less code.
     # No meaning to allow Vector([1.0, 2.0, 3.0]) == tuple(1, 2, 3)
     def __eq__(self, other):
@@ -56,17 +120,57 @@ class Vector:
                 all(a==b for a, b in zip(self, other))
         else:
             return NotImplemented
+    '''
+
+    # Same logic again, but comparing two memoryviews runs entirely in C,
+    #   without boxing a float per component. Items are compared as
+    #   numbers, not as bytes, so the result is exactly that of the
+    #   element-wise version above: nan != nan, -0.0 == 0.0, and a 'f'
+    #   vector equals a 'd' vector holding the same values.
+    # No identity shortcut here, which would make a vector holding a nan
+    #   equal to itself. Containers (list.__contains__, dict and set lookups)
+    #   already check identity before calling __eq__, so interned Vectors
+    #   (see InternPool) are matched without comparing their components.
+    def __eq__(self, other):
+        if isinstance(other, Vector):
+            return len(self) == len(other) and \
+                memoryview(self._components) == memoryview(other._components)
+        else:
+            # SparseVector.__eq__ handles the mixed case.
+            return NotImplemented
+
+    # Same tolerances as math.isclose, which map() calls from C for every
+    #   pair of components. Equal buffers need no per-component work at all.
+    def allclose(self, other, rel_tol=1e-09, abs_tol=0.0):
+        theirs = other._components if isinstance(other, Vector) else other
+        if len(self) != len(theirs):
+            return False
+        if isinstance(other, Vector) and self == other:
+            return True
+        isclose = functools.partial(math.isclose, rel_tol=rel_tol,
+                                    abs_tol=abs_tol)
+        return all(map(isclose, self._components, theirs))
+
+    # A Vector never changes after construction, so its hash and its norm
+    #   are computed on first use and cached on the instance. The class
+    #   attributes below stand for 'not computed yet'.
+    _hash = None
+    _norm = None
 
     def __hash__(self):
-        # A perfect example of a map-reduce computation
-        hashes = (hash(x) for x in self._components)
-        # When using reduce, it's a good pratice to provide the third
-        #   argument. It will be the value returned if the sequence is
-        #   empty and is used as the first argument in reducing loop.
-        return functools.reduce(operator.xor, hashes, 0)
+        if self._hash is None:
+            # A perfect example of a map-reduce computation
+            hashes = (hash(x) for x in self._components)
+            # When using reduce, it's a good pratice to provide the third
+            #   argument. It will be the value returned if the sequence is
+            #   empty and is used as the first argument in reducing loop.
+            self._hash = functools.reduce(operator.xor, hashes, 0)
+        return self._hash
 
     def __abs__(self):
-        return math.sqrt(sum(x * x for x in self))
+        if self._norm is None:
+            self._norm = math.sqrt(sum(x * x for x in self))
+        return self._norm
 
     '''
         Special methods implementing unary or infix operators should never change
@@ -77,7 +181,7 @@ class Vector:
     # special method for the '-' unary operator
     # returns a new instance
     def __neg__(self):
-        return Vector(-x for x in self)
+        return Vector((-x for x in self), self.typecode)
 
     # special method for the '+' unary operator
     # returns a new instance
@@ -93,12 +197,22 @@ class Vector:
     #   and return NotImplemented. This way, we leave the door open for the
     #   implementor of the other operand type to perform the operation when
     #   Python tries the reversed method call.
+    # Two Vectors give a result with the wider of their typecodes.
+    # A SparseVector knows how to touch only its non-zero components, so
+    #   we step aside and let Python call its reflected method. So does a
+    #   lazy expression (see vector_expr), which marks itself with a true
+    #   _lazy attribute: it keeps this Vector as one more operand.
     def __add__(self, other):
+        if isinstance(other, SparseVector) or getattr(other, '_lazy', False):
+            return NotImplemented
+        typecode = self.typecode
+        if isinstance(other, Vector):
+            typecode = promote(typecode, other.typecode)
         try :
             # pairs is a generator that will produce tuples (a, b)
             pairs = itertools.zip_longest(self, other, fillvalue=0.0)
             # returns a new instance
-            return Vector(a + b for a, b in pairs)
+            return Vector((a + b for a, b in pairs), typecode)
         except TypeError:
             return NotImplemented
 
@@ -109,13 +223,54 @@ class Vector:
     def __mul__(self, scalar):
         # goose typing, check the type of scalar against the numbers.Real ABC
         if isinstance(scalar, numbers.Real):
-            return Vector(n * scalar for n in self)
+            return Vector((n * scalar for n in self), self.typecode)
         else:
             return NotImplemented
 
     def __rmul__(self, scalar):
         return self * scalar
 
+    # The '@' operator computes the dot product. Like __add__, a shorter
+    #   operand behaves as if padded with zeros, which for a dot product is
+    #   the same as stopping at the shorter one.
+    # When both operands are Vectors with the same typecode, map() walks the
+    #   two arrays directly and sum() consumes it without a generator frame.
+    #   Anything else goes through the duck-typed path.
+    def __matmul__(self, other):
+        if isinstance(other, Vector) and other.typecode == self.typecode:
+            return sum(map(operator.mul, self._components, other._components))
+        if isinstance(other, SparseVector) or getattr(other, '_lazy', False):
+            return NotImplemented
+        try:
+            return sum(a * b for a, b in zip(self, other))
+        except TypeError:
+            return NotImplemented
+
+    def __rmatmul__(self, other):
+        return self @ other
+
+    def dot(self, other):
+        return self @ other
+
+    def cosine(self, other):
+        if isinstance(other, Vector):
+            other_norm = abs(other)
+        else:
+            other_norm = math.sqrt(sum(x * x for x in other))
+        norms = abs(self) * other_norm
+        if not norms:
+            raise ValueError('cosine similarity of a zero vector is undefined')
+        return self.dot(other) / norms
+
+    # Euclidean distance, without building the intermediate difference
+    #   Vector. math.dist does the whole computation in C.
+    def distance(self, other):
+        if (isinstance(other, Vector) and other.typecode == self.typecode
+                and len(other) == len(self)):
+            return math.dist(self._components, other._components)
+        pairs = itertools.zip_longest(self, other, fillvalue=0.0)
+        return math.sqrt(sum((a - b) * (a - b) for a, b in pairs))
+
     def __bool__(self):
         return bool(abs(self))
 
@@ -125,10 +280,13 @@ class Vector:
         return len(self._components)
 
     # index can be a slice object
+    # Since a Vector never changes, a slice can safely share the buffer of
+    #   its source instead of copying it: windows like v[i:i+1024] in a
+    #   tight loop don't allocate a new array.
     def __getitem__(self, index):
         cls = type(self)
         if isinstance(index, slice):
-            return cls(self._components[index])
+            return cls._fromview(memoryview(self._components)[index])
         elif isinstance(index, numbers.Integral):
             return self._components[index]
         else:
@@ -174,13 +332,32 @@ class Vector:
         else:
             return a
 
+    # Calling angle(n) for every n sums the squares of self[n:] over and
+    #   over, which is quadratic in len(self). angles_array() computes all
+    #   the angles at once from the suffix sums of squares, accumulated in
+    #   a single pass from the last component backwards.
+    def angles_array(self):
+        comps = self._components
+        if len(comps) < 2:
+            return array('d')
+        squares = map(operator.mul, reversed(comps), reversed(comps))
+        # tail_sums[k] is the sum of squares of the last k+1 components.
+        tail_sums = list(itertools.accumulate(squares))
+        # Angle n, for n in 1..len-1, pairs sqrt(sum of squares of
+        #   self[n:]) with self[n-1].
+        radii = map(math.sqrt, reversed(tail_sums[:-1]))
+        angles = array('d', map(math.atan2, radii, comps[:-1]))
+        if comps[-1] < 0:
+            angles[-1] = math.pi * 2 - angles[-1]
+        return angles
+
     def angles(self):
-        return (self.angle(n) for n in range(1, len(self)))
+        return iter(self.angles_array())
 
     def __format__(self, fmt_spec=''):
         if fmt_spec.endswith('h'):
             fmt_spec = fmt_spec[:-1]
-            coords = itertools.chain([abs(self)], self.angles())
+            coords = itertools.chain([abs(self)], self.angles_array())
             outer_fmt = '<{}>'
         else:
             coords = self
@@ -188,12 +365,762 @@ class Vector:
         components = (format(c, fmt_spec) for c in coords)
         return outer_fmt.format(', '.join(components))
 
+    # With copy=False the new Vector is a read-only view over octets. This
+    #   is only safe if nobody changes octets afterwards (bytes, mmap opened
+    #   for reading, ...), since a Vector is supposed to be immutable.
     @classmethod
-    def frombytes(cls, octets):
+    def frombytes(cls, octets, copy=True):
         typecode = chr(octets[0])
-        memv = memoryview(octets[1:]).cast(typecode)
+        if typecode == QuantizedVector.typecode:
+            return QuantizedVector.frombytes(octets, copy)
+        if typecode == SparseVector.typecode:
+            return SparseVector.frombytes(octets, copy)
+        # Slicing the memoryview, not octets, avoids copying the payload.
+        memv = memoryview(octets)[1:].cast(typecode)
+        if copy:
+            return cls(memv)
+        return cls._fromview(memv.toreadonly())
+
+    # Compact int8 copy of this vector; see QuantizedVector.
+    def quantize(self):
+        return QuantizedVector.fromvector(self)
+
+    def tosparse(self):
+        return SparseVector.fromdense(self)
+
+    # The canonical Vector with these components, from an InternPool
+    #   (INTERN_POOL unless another one is given). Takes a Vector or anything
+    #   the constructor accepts.
+    @classmethod
+    def intern(cls, components, typecode=None, pool=None):
+        if pool is None:
+            pool = INTERN_POOL
+        return pool.intern(components, typecode)
+
+
+# Symmetric linear quantization of a Vector to signed bytes: component i is
+#   stored as codes[i] = round(v[i] / scale), with codes in -127..127 and
+#   scale = max(abs(v)) / 127. That takes 1 byte per component instead of 8
+#   for 'd', and every component is off by at most scale / 2.
+# Operations that would leave the integer grid (adding a Vector, ...) give a
+#   plain Vector, while abs, @ and scalar * work on the codes directly.
+class QuantizedVector:
+    typecode = 'b'
+    levels = 127
+
+    # bytes(q) is the typecode byte, the scale as a native double and the
+    #   codes, so Vector.frombytes can recognize it by its first byte.
+    _scale_format = 'd'
+    _header_size = 1 + struct.calcsize(_scale_format)
+
+    def __init__(self, codes, scale):
+        self._codes = array(self.typecode, codes)
+        self.scale = float(scale)
+
+    @classmethod
+    def fromvector(cls, vector):
+        peak = max(map(abs, vector), default=0.0)
+        scale = peak / cls.levels if peak else 1.0
+        return cls((round(x / scale) for x in vector), scale)
+
+    # Largest difference between a component and its dequantized value.
+    @property
+    def max_error(self):
+        return self.scale / 2
+
+    # Bound on the Euclidean distance between the original vector and the
+    #   dequantized one.
+    @property
+    def norm_error(self):
+        return self.max_error * math.sqrt(len(self))
+
+    def dequantize(self, typecode=None):
+        scale = self.scale
+        return Vector((c * scale for c in self._codes), typecode)
+
+    def __len__(self):
+        return len(self._codes)
+
+    def __iter__(self):
+        scale = self.scale
+        return (c * scale for c in self._codes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return type(self)(self._codes[index], self.scale)
+        return self._codes[index] * self.scale
+
+    def __repr__(self):
+        codes = reprlib.repr(array(self.typecode, self._codes[:6]))
+        codes = codes[codes.find('['):-1]
+        return '{}({}, scale={!r})'.format(type(self).__name__, codes,
+                                           self.scale)
+
+    def __str__(self):
+        return str(tuple(self))
+
+    def __bytes__(self):
+        return (bytes([ord(self.typecode)]) +
+                struct.pack(self._scale_format, self.scale) +
+                bytes(self._codes))
+
+    @classmethod
+    def frombytes(cls, octets, copy=True):
+        scale, = struct.unpack_from(cls._scale_format, octets, 1)
+        codes = memoryview(octets)[cls._header_size:].cast(cls.typecode)
+        if copy:
+            return cls(codes, scale)
+        quantized = cls.__new__(cls)
+        quantized._codes = codes.toreadonly()
+        quantized.scale = scale
+        return quantized
+
+    # As for Vector: frombytes(..., copy=False) leaves a memoryview, which
+    #   pickle refuses, so the codes are rebuilt as an owned array.
+    def __reduce__(self):
+        return type(self), (array(self.typecode, self._codes), self.scale)
+
+    # Equality is on the dequantized values, so that it stays transitive
+    #   through Vector: codes [2] at scale 1 equal codes [1] at scale 2.
+    #   With a common scale, comparing the codes is enough.
+    def __eq__(self, other):
+        if isinstance(other, QuantizedVector) and self.scale == other.scale:
+            return self._codes == other._codes
+        elif isinstance(other, (QuantizedVector, Vector)):
+            return len(self) == len(other) and \
+                all(a == b for a, b in zip(self, other))
+        else:
+            return NotImplemented
+
+    # A QuantizedVector equals a Vector holding its dequantized components,
+    #   so it must hash like one: same xor of the components' hashes.
+    def __hash__(self):
+        hashes = map(hash, self)
+        return functools.reduce(operator.xor, hashes, 0)
+
+    # The sum of squares is computed exactly, on integers.
+    def __abs__(self):
+        codes = self._codes
+        return self.scale * math.sqrt(sum(map(operator.mul, codes, codes)))
+
+    # A zero scale (after q * 0) zeroes every component, whatever the codes.
+    def __bool__(self):
+        return bool(self.scale) and any(self._codes)
+
+    def __neg__(self):
+        # Safe because codes never reach -128.
+        return type(self)((-c for c in self._codes), self.scale)
+
+    # Scaling only changes the scale, never the codes' precision.
+    def __mul__(self, scalar):
+        if isinstance(scalar, numbers.Real):
+            if scalar < 0:
+                return (-self) * -scalar
+            return type(self)(self._codes, self.scale * scalar)
+        else:
+            return NotImplemented
+
+    def __rmul__(self, scalar):
+        return self * scalar
+
+    def __add__(self, other):
+        return self.dequantize() + other
+
+    def __radd__(self, other):
+        return self + other
+
+    def __matmul__(self, other):
+        if isinstance(other, QuantizedVector):
+            products = map(operator.mul, self._codes, other._codes)
+            return self.scale * other.scale * sum(products)
+        return self.dequantize() @ other
+
+    def __rmatmul__(self, other):
+        return self @ other
+
+
+# A SparseVector of length dim stores only its non-zero components: their
+#   positions in a sorted array of indices, and their values in a parallel
+#   array. Memory and the cost of most operations then depend on the number
+#   of non-zeros, not on dim.
+# It follows the Vector protocol. Mixing it with a Vector costs O(nnz)
+#   for @, one pass over the dense operand (in C) for ==, and one copy of
+#   the dense operand for +.
+class SparseVector:
+    typecode = 's'
+    value_typecode = 'd'
+    index_typecode = 'q'
+
+    # bytes(s) is the typecode byte, dim and nnz as native int64, then the
+    #   indices and the values.
+    _header_format = 'qq'
+    _header_size = 1 + struct.calcsize(_header_format)
+
+    # Takes (index, value) pairs in any order. Zeros are dropped, and a
+    #   repeated index keeps the last value.
+    def __init__(self, items, dim):
+        entries = dict(items)
+        pairs = sorted((i, x) for i, x in entries.items() if x != 0)
+        if pairs and not 0 <= pairs[0][0] <= pairs[-1][0] < dim:
+            msg = 'indices must be in range({})'
+            raise IndexError(msg.format(dim))
+        self._indices = array(self.index_typecode, (i for i, _ in pairs))
+        self._values = array(self.value_typecode, (x for _, x in pairs))
+        self.dim = dim
+
+    # Alternative constructor for arrays already sorted and free of zeros.
+    @classmethod
+    def _fromarrays(cls, indices, values, dim):
+        sparse = cls.__new__(cls)
+        sparse._indices = indices
+        sparse._values = values
+        sparse.dim = dim
+        return sparse
+
+    @classmethod
+    def fromarrays(cls, indices, values, dim):
+        return cls(zip(indices, values), dim)
+
+    @classmethod
+    def fromdense(cls, components):
+        if isinstance(components, Vector):
+            components = components._components
+        pairs = [(i, x) for i, x in enumerate(components) if x != 0]
+        indices = array(cls.index_typecode, (i for i, _ in pairs))
+        values = array(cls.value_typecode, (x for _, x in pairs))
+        return cls._fromarrays(indices, values, len(components))
+
+    def todense(self):
+        dense = array(self.value_typecode)
+        dense.frombytes(bytes(dense.itemsize * self.dim))
+        for i, x in zip(self._indices, self._values):
+            dense[i] = x
+        return Vector(dense)
+
+    def items(self):
+        return zip(self._indices, self._values)
+
+    @property
+    def nnz(self):
+        return len(self._values)
+
+    def __len__(self):
+        return self.dim
+
+    # Runs of zeros come from itertools.repeat, so no dense array is built.
+    def __iter__(self):
+        position = 0
+        for i, x in zip(self._indices, self._values):
+            yield from itertools.repeat(0.0, i - position)
+            yield x
+            position = i + 1
+        yield from itertools.repeat(0.0, self.dim - position)
+
+    def __repr__(self):
+        # As in Vector, reprlib never needs more than the first few items.
+        indices = reprlib.repr(self._indices[:7].tolist())
+        values = reprlib.repr(self._values[:7].tolist())
+        return '{}.fromarrays({}, {}, dim={})'.format(
+            type(self).__name__, indices, values, self.dim)
+
+    def __str__(self):
+        return str(tuple(self))
+
+    def __bytes__(self):
+        header = struct.pack(self._header_format, self.dim, self.nnz)
+        return (bytes([ord(self.typecode)]) + header +
+                bytes(self._indices) + bytes(self._values))
+
+    @classmethod
+    def frombytes(cls, octets, copy=True):
+        dim, nnz = struct.unpack_from(cls._header_format, octets, 1)
+        memv = memoryview(octets)[cls._header_size:]
+        split = nnz * struct.calcsize(cls.index_typecode)
+        indices = memv[:split].cast(cls.index_typecode)
+        values = memv[split:].cast(cls.value_typecode)
+        if copy:
+            indices = array(cls.index_typecode, indices)
+            values = array(cls.value_typecode, values)
+        else:
+            indices, values = indices.toreadonly(), values.toreadonly()
+        return cls._fromarrays(indices, values, dim)
+
+    # Same as Vector.__reduce__, for the views of frombytes(..., copy=False).
+    def __reduce__(self):
+        return type(self)._fromarrays, (
+            array(self.index_typecode, self._indices),
+            array(self.value_typecode, self._values), self.dim)
+
+    def __getitem__(self, index):
+        cls = type(self)
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.dim)
+            if step != 1:
+                return cls.fromdense(self.todense()[index])
+            stop = max(start, stop)
+            lo = bisect.bisect_left(self._indices, start)
+            hi = bisect.bisect_left(self._indices, stop)
+            indices = array(self.index_typecode,
+                            (i - start for i in self._indices[lo:hi]))
+            return cls._fromarrays(indices, self._values[lo:hi], stop - start)
+        elif isinstance(index, numbers.Integral):
+            try:
+                index = range(self.dim)[index]
+            except IndexError:
+                msg = '{cls.__name__} index out of range'
+                raise IndexError(msg.format(cls=cls)) from None
+            pos = bisect.bisect_left(self._indices, index)
+            if pos < len(self._indices) and self._indices[pos] == index:
+                return self._values[pos]
+            return 0.0
+        else:
+            msg = '{cls.__name__} indices must be integers'
+            raise TypeError(msg.format(cls=cls))
+
+    # Equal to a Vector with the same components, so the hash must agree
+    #   with Vector.__hash__. Luckily hash(0.0) == 0 is neutral for xor.
+    _hash = None
+    _norm = None
+
+    def __hash__(self):
+        if self._hash is None:
+            hashes = (hash(x) for x in self._values)
+            self._hash = functools.reduce(operator.xor, hashes, 0)
+        return self._hash
+
+    def __abs__(self):
+        if self._norm is None:
+            values = self._values
+            self._norm = math.sqrt(sum(map(operator.mul, values, values)))
+        return self._norm
+
+    def __bool__(self):
+        return bool(self._values)
+
+    def __eq__(self, other):
+        if isinstance(other, SparseVector):
+            return (self.dim == other.dim and
+                    self._indices == other._indices and
+                    self._values == other._values)
+        elif isinstance(other, Vector):
+            if len(other) != self.dim:
+                return False
+            dense = other._components
+            # Same values at our indices, and no other non-zero in dense.
+            #   The first check is O(nnz); counting the non-zeros of dense is
+            #   O(dim), but runs in C.
+            picked = map(dense.__getitem__, self._indices)
+            return (all(map(operator.eq, picked, self._values)) and
+                    sum(map(bool, dense)) == self.nnz)
+        else:
+            return NotImplemented
+
+    def __neg__(self):
+        return self * -1
+
+    def __pos__(self):
+        return self
+
+    # Sparse + sparse merges the two sorted index arrays in one linear pass:
+    #   O(nnz1 + nnz2), with no sorting. Sums that cancel out are dropped.
+    # Sparse + Vector copies the dense array once, then adds the non-zeros.
+    #   As with Vector, the shorter operand is padded with zeros.
+    def __add__(self, other):
+        if isinstance(other, SparseVector):
+            return self._merge_add(other)
+        elif isinstance(other, Vector):
+            dense = array(promote(self.value_typecode, other.typecode),
+                          other._components)
+            missing = self.dim - len(dense)
+            if missing > 0:
+                dense.extend(itertools.repeat(0.0, missing))
+            for i, x in self.items():
+                dense[i] += x
+            return Vector(dense)
+        try:
+            return self.todense() + other
+        except TypeError:
+            return NotImplemented
+
+    def __radd__(self, other):
+        return self + other
+
+    def _merge_add(self, other):
+        indices = array(self.index_typecode)
+        values = array(self.value_typecode)
+        mine, theirs = self._indices, other._indices
+        p, q = 0, 0
+        while p < len(mine) and q < len(theirs):
+            i, j = mine[p], theirs[q]
+            if i < j:
+                indices.append(i)
+                values.append(self._values[p])
+                p += 1
+            elif j < i:
+                indices.append(j)
+                values.append(other._values[q])
+                q += 1
+            else:
+                x = self._values[p] + other._values[q]
+                if x != 0:
+                    indices.append(i)
+                    values.append(x)
+                p += 1
+                q += 1
+        # At most one of the two has a tail left.
+        indices.extend(mine[p:])
+        values.extend(self._values[p:])
+        indices.extend(theirs[q:])
+        values.extend(other._values[q:])
+        return self._fromarrays(indices, values, max(self.dim, other.dim))
+
+    def __mul__(self, scalar):
+        if isinstance(scalar, numbers.Real):
+            if not scalar:
+                return type(self)((), self.dim)
+            factors = itertools.repeat(scalar)
+            values = array(self.value_typecode,
+                           map(operator.mul, self._values, factors))
+            return self._fromarrays(array(self.index_typecode, self._indices),
+                                    values, self.dim)
+        else:
+            return NotImplemented
+
+    def __rmul__(self, scalar):
+        return self * scalar
+
+    # Only positions that are non-zero in both operands contribute. Against
+    #   a Vector, that means one lookup per non-zero.
+    def __matmul__(self, other):
+        if isinstance(other, SparseVector):
+            if other.nnz < self.nnz:
+                return other @ self
+            theirs = dict(other.items())
+            return sum(x * theirs.get(i, 0.0) for i, x in self.items())
+        elif isinstance(other, Vector):
+            dense = other._components
+            # Indices past the end of other meet implicit zeros.
+            size = bisect.bisect_left(self._indices, len(dense))
+            picked = map(dense.__getitem__, self._indices[:size])
+            return sum(map(operator.mul, picked, self._values[:size]))
+        try:
+            return self.todense() @ other
+        except TypeError:
+            return NotImplemented
+
+    def __rmatmul__(self, other):
+        return self @ other
+
+    def dot(self, other):
+        return self @ other
+
+
+# A Vector whose augmented assignment operators update the existing array
+#   instead of building a new one. An accumulation loop like 'acc += v' then
+#   runs without allocating a full-size array per step.
+# Being mutable, it must not be hashable: __hash__ is set to None, while
+#   the plain, immutable Vector keeps its hash contract. For the same reason,
+#   every update drops the cached norm.
+class MutableVector(Vector):
+
+    # Work proceeds in fixed-size chunks over memoryviews, so the scratch
+    #   arrays stay small no matter how long the vector is.
+    chunk_size = 4096
+
+    __hash__ = None
+
+    # Views would let changes leak between vectors, so a MutableVector
+    #   always copies: slices and frombytes(..., copy=False) included.
+    @classmethod
+    def _fromview(cls, memv):
         return cls(memv)
 
+    # Get a sliceable buffer out of the right operand of an in-place operator.
+    def _operand(self, other, op_symbol):
+        if isinstance(other, Vector):
+            theirs = other._components
+        else:
+            try:
+                theirs = array(self.typecode, other)
+            except TypeError:
+                self_cls = type(self).__name__
+                msg = 'right operand in {} must be {!r} or an iterable'
+                raise TypeError(msg.format(op_symbol, self_cls)) from None
+        # A longer operand grows self with zeros, mirroring __add__.
+        missing = len(theirs) - len(self._components)
+        if missing > 0:
+            self._components.extend(itertools.repeat(0.0, missing))
+        return memoryview(theirs)
+
+    # Replace self[i] with func(self[i], *(arg[i] for arg in args)) in place.
+    #   Arguments shorter than self leave the remaining components untouched.
+    def _update(self, func, *args):
+        size = min(map(len, args), default=len(self._components))
+        mine = memoryview(self._components)
+        for start in range(0, size, self.chunk_size):
+            stop = min(start + self.chunk_size, size)
+            chunks = (arg[start:stop] for arg in args)
+            mine[start:stop] = array(self.typecode,
+                                     map(func, mine[start:stop], *chunks))
+        mine.release()
+        self._norm = None
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            value = array(self.typecode, value)
+        self._components[index] = value
+        self._norm = None
+
+    # self += alpha * sparse only visits the non-zero components of sparse.
+    def _scatter(self, sparse, alpha):
+        missing = len(sparse) - len(self._components)
+        if missing > 0:
+            self._components.extend(itertools.repeat(0.0, missing))
+        comps = self._components
+        for i, value in zip(sparse._indices, sparse._values):
+            comps[i] += alpha * value
+        self._norm = None
+        return self
+
+    def __iadd__(self, other):
+        if isinstance(other, SparseVector):
+            return self._scatter(other, 1.0)
+        theirs = self._operand(other, '+=')
+        self._update(operator.add, theirs)
+        # Augmented assignment special methods must return self
+        return self
+
+    def __isub__(self, other):
+        if isinstance(other, SparseVector):
+            return self._scatter(other, -1.0)
+        theirs = self._operand(other, '-=')
+        self._update(operator.sub, theirs)
+        return self
+
+    def __imul__(self, scalar):
+        if isinstance(scalar, numbers.Real):
+            self._update(functools.partial(operator.mul, scalar))
+            return self
+        else:
+            return NotImplemented
+
+    # Fused update self += alpha * x, named after the BLAS routine. No
+    #   temporary Vector is built for alpha * x.
+    def axpy(self, alpha, x):
+        if isinstance(x, SparseVector):
+            return self._scatter(x, alpha)
+        theirs = self._operand(x, 'axpy')
+        self._update(lambda a, b: a + alpha * b, theirs)
+        return self
+
+
+# A VectorBatch keeps N vectors of the same length in one contiguous,
+#   row-major array instead of N Vector instances, each with its own array and
+#   object header. Batched operations make a single pass over that buffer, and
+#   rows are handed out as Vector instances sharing it (no copy).
+class VectorBatch:
+    typecode = 'd'
+
+    def __init__(self, vectors, dim=None):
+        self._components = array(self.typecode)
+        for row in vectors:
+            if isinstance(row, Vector) and row.typecode == self.typecode:
+                row = row._components
+            if dim is None:
+                dim = len(row)
+            if dim < 1:
+                msg = 'vectors in a batch must have at least one component'
+                raise ValueError(msg)
+            if len(row) != dim:
+                msg = 'all vectors in a batch must have length {}, got {}'
+                raise ValueError(msg.format(dim, len(row)))
+            # extend() copies straight from another array of the same type.
+            self._components.extend(row)
+        # dim 0 stands for an empty batch whose dimension is unknown.
+        self.dim = 0 if dim is None else dim
+
+    # Alternative constructor from a flat, row-major sequence of numbers.
+    # An empty buffer may have dim 0, like VectorBatch(()).
+    @classmethod
+    def frombuffer(cls, components, dim):
+        batch = cls.__new__(cls)
+        batch._components = array(cls.typecode, components)
+        batch.dim = dim
+        if dim == 0 and not batch._components:
+            return batch
+        if dim < 1 or len(batch._components) % dim:
+            msg = 'buffer of length {} cannot hold rows of length {}'
+            raise ValueError(msg.format(len(batch._components), dim))
+        return batch
+
+    def __repr__(self):
+        return '{}(n={}, dim={})'.format(type(self).__name__, len(self),
+                                         self.dim)
+
+    def __len__(self):
+        return len(self._components) // self.dim if self.dim else 0
+
+    # Read-only memoryview slices over the shared buffer, one per row.
+    def _rows(self):
+        if not len(self):
+            return iter(())
+        memv = memoryview(self._components).toreadonly()
+        dim = self.dim
+        return (memv[i:i + dim] for i in range(0, len(memv), dim))
+
+    def __iter__(self):
+        return (Vector._fromview(row) for row in self._rows())
+
+    # An integer index returns a row view, a slice returns a new batch.
+    def __getitem__(self, index):
+        cls = type(self)
+        dim = self.dim
+        if isinstance(index, slice):
+            rows = range(*index.indices(len(self)))
+            if rows.step == 1:
+                start, stop = rows.start * dim, rows.stop * dim
+                return cls.frombuffer(self._components[start:stop], dim)
+            return cls((self[i] for i in rows), dim)
+        elif isinstance(index, numbers.Integral):
+            try:
+                index = range(len(self))[index]
+            except IndexError:
+                msg = '{cls.__name__} index out of range'
+                raise IndexError(msg.format(cls=cls)) from None
+            memv = memoryview(self._components).toreadonly()
+            return Vector._fromview(memv[index * dim:(index + 1) * dim])
+        else:
+            msg = '{cls.__name__} indices must be integers'
+            raise TypeError(msg.format(cls=cls))
+
+    # abs() of a batch gives the norm of every row, as an array.
+    def __abs__(self):
+        return array(self.typecode,
+                     (math.sqrt(sum(map(operator.mul, row, row)))
+                      for row in self._rows()))
+
+    # Row-wise addition: batch + batch of the same shape adds matching rows,
+    #   batch + Vector adds the vector to every row. Both are one pass over
+    #   the buffer.
+    def __add__(self, other):
+        if isinstance(other, VectorBatch):
+            if (len(self), self.dim) != (len(other), other.dim):
+                return NotImplemented
+            addends = other._components
+        elif isinstance(other, Vector):
+            if len(other) != self.dim:
+                return NotImplemented
+            addends = itertools.cycle(other._components)
+        else:
+            return NotImplemented
+        components = map(operator.add, self._components, addends)
+        return type(self).frombuffer(components, self.dim)
+
+    def __radd__(self, other):
+        return self + other
+
+    def __mul__(self, scalar):
+        if isinstance(scalar, numbers.Real):
+            factors = itertools.repeat(scalar)
+            components = map(operator.mul, self._components, factors)
+            return type(self).frombuffer(components, self.dim)
+        else:
+            return NotImplemented
+
+    def __rmul__(self, scalar):
+        return self * scalar
+
+    # Row-wise scaling: multiply each row by its own factor.
+    def scale(self, factors):
+        factors = list(factors)
+        if len(factors) != len(self):
+            msg = 'expected {} factors, got {}'
+            raise ValueError(msg.format(len(self), len(factors)))
+        dim = self.dim
+        repeated = itertools.chain.from_iterable(
+            itertools.repeat(f, dim) for f in factors)
+        components = map(operator.mul, self._components, repeated)
+        return type(self).frombuffer(components, dim)
+
+    # batch.dot(vector) returns the N dot products of each row with vector.
+    # batch.dot(other_batch) returns the N x M batch of all row pairs.
+    # An empty batch matches any dimension.
+    def dot(self, other):
+        if isinstance(other, Vector):
+            if len(self) and len(other) != self.dim:
+                msg = 'vector of length {} does not match batch dim {}'
+                raise ValueError(msg.format(len(other), self.dim))
+            theirs = other._components
+            return array(self.typecode,
+                         (sum(map(operator.mul, row, theirs))
+                          for row in self._rows()))
+        elif isinstance(other, VectorBatch):
+            if len(self) and len(other) and other.dim != self.dim:
+                msg = 'batch dims do not match: {} and {}'
+                raise ValueError(msg.format(self.dim, other.dim))
+            theirs = list(other._rows())
+            components = (sum(map(operator.mul, row, col))
+                          for row in self._rows() for col in theirs)
+            return type(self).frombuffer(components, len(other))
+        else:
+            msg = 'unsupported operand type for dot: {.__name__!r}'
+            raise TypeError(msg.format(type(other)))
+
+    def __matmul__(self, other):
+        if isinstance(other, (Vector, VectorBatch)):
+            return self.dot(other)
+        else:
+            return NotImplemented
+
+# A table of canonical Vectors, so that many identical vectors (repeated
+#   centroids, one-hot codes, ...) share one buffer and compare equal by
+#   identity. Keys are (typecode, raw bytes of the components), and the
+#   canonical Vector is a read-only view over those same key bytes, so each
+#   distinct vector is stored once. Values are weak references: an entry
+#   goes away when nobody uses its Vector any more.
+class InternPool:
+
+    def __init__(self):
+        self._table = weakref.WeakValueDictionary()
+        self.lookups = 0
+        self.hits = 0
+        # Total size of the duplicate buffers that interning made redundant.
+        self.bytes_saved = 0
+
+    def intern(self, vector, typecode=None):
+        if isinstance(vector, Vector) and type(vector).__hash__ is None:
+            msg = 'cannot intern a mutable {.__name__}'
+            raise TypeError(msg.format(type(vector)))
+        if (not isinstance(vector, Vector) or
+                typecode not in (None, vector.typecode)):
+            vector = Vector(vector, typecode)
+        octets = memoryview(vector._components).tobytes()
+        key = (vector.typecode, octets)
+        self.lookups += 1
+        canonical = self._table.get(key)
+        if canonical is not None:
+            self.hits += 1
+            self.bytes_saved += len(octets)
+            return canonical
+        canonical = Vector._fromview(memoryview(octets).cast(vector.typecode))
+        self._table[key] = canonical
+        return canonical
+
+    def __len__(self):
+        return len(self._table)
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    def __repr__(self):
+        return '{}(size={}, hit_rate={:.1%}, bytes_saved={})'.format(
+            type(self).__name__, len(self), self.hit_rate, self.bytes_saved)
+
+
+INTERN_POOL = InternPool()
+
+
 if __name__ =='__main__':
     v1 = Vector(range(6))
     print('repr:')
@@ -212,3 +1139,12 @@ if __name__ =='__main__':
 
     print(hash(v1))
     print(v1 == Vector(range(5)))
+
+    batch = VectorBatch([range(3), [3, 4, 0], [0, 0, 5]])
+    print(batch, repr(batch[1]), abs(batch))
+    print(batch.dot(Vector([1, 1, 1])))
+    print(list(batch + Vector([1, 1, 1])))
+
+    one_hot = [Vector.intern(i == j for j in range(100)) for i in range(10)
+               for _ in range(100)]
+    print(one_hot[0] is one_hot[99], INTERN_POOL)
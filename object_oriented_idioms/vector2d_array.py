@@ -0,0 +1,223 @@
+'''
+Struct-of-arrays storage for many Vector2d points.
+
+A Vector2d is a full Python object with an instance __dict__ holding two float
+objects: around 100 bytes or more for 16 bytes of data, depending on the
+Python version, and every point visited is a few pointer hops away from the
+next one. Vector2dArray keeps all the x coordinates in one array('d') and all
+the y coordinates in another:
+
+    - abs() and angle() return the magnitudes and angles of all the points at
+      once, as arrays computed by map() over the two buffers;
+    - format() applies a Vector2d format spec, 'p' for polar included, to
+      every point;
+    - bytes() and frombytes() move all the points in one go: a typecode byte,
+      then the x buffer, then the y buffer;
+    - indexing returns a Vector2dView, a Vector2d that reads its coordinates
+      from the arrays instead of storing them.
+
+    >>> points = Vector2dArray([Vector2d(3, 4), (0, 1)])
+    >>> abs(points)
+    array('d', [5.0, 1.0])
+    >>> points[0]
+    Vector2dView(3.0, 4.0)
+    >>> points[0] == Vector2d(3, 4)
+    True
+    >>> format(points, '.2fp')
+    '[<5.00, 0.93>, <1.00, 1.57>]'
+
+Run this module as a script for memory and throughput figures against a list
+of Vector2d.
+'''
+
+from array import array
+import gc
+import math
+import numbers
+import random
+import time
+import tracemalloc
+
+from vector2d import Vector2d
+
+
+# The view only stores where its point is; the properties replace the
+#   name-mangled attributes of Vector2d, so every inherited method works.
+class Vector2dView(Vector2d):
+    __slots__ = ('_owner', '_index')
+
+    def __init__(self, owner, index):
+        self._owner = owner
+        self._index = index
+
+    @property
+    def x(self):
+        return self._owner._x[self._index]
+
+    @property
+    def y(self):
+        return self._owner._y[self._index]
+
+
+class Vector2dArray:
+    typecode = 'd'
+
+    def __init__(self, points=()):
+        self._x = array(self.typecode)
+        self._y = array(self.typecode)
+        self.extend(points)
+
+    # Alternative constructor from separate sequences of coordinates.
+    @classmethod
+    def fromxy(cls, xs, ys):
+        points = cls()
+        points._x.extend(array(cls.typecode, xs))
+        points._y.extend(array(cls.typecode, ys))
+        if len(points._x) != len(points._y):
+            msg = 'got {} x coordinates and {} y coordinates'
+            raise ValueError(msg.format(len(points._x), len(points._y)))
+        return points
+
+    def append(self, point):
+        x, y = point
+        self._x.append(x)
+        self._y.append(y)
+
+    def extend(self, points):
+        for point in points:
+            self.append(point)
+
+    # Read-only views of the coordinate buffers, for bulk processing.
+    @property
+    def xs(self):
+        return memoryview(self._x).toreadonly()
+
+    @property
+    def ys(self):
+        return memoryview(self._y).toreadonly()
+
+    def __len__(self):
+        return len(self._x)
+
+    def __iter__(self):
+        return (Vector2dView(self, i) for i in range(len(self)))
+
+    # An integer index returns a view, a slice returns a new array.
+    def __getitem__(self, index):
+        cls = type(self)
+        if isinstance(index, slice):
+            return cls.fromxy(self._x[index], self._y[index])
+        elif isinstance(index, numbers.Integral):
+            try:
+                index = range(len(self))[index]
+            except IndexError:
+                msg = '{cls.__name__} index out of range'
+                raise IndexError(msg.format(cls=cls)) from None
+            return Vector2dView(self, index)
+        else:
+            msg = '{cls.__name__} indices must be integers'
+            raise TypeError(msg.format(cls=cls))
+
+    def __repr__(self):
+        return '{}(n={})'.format(type(self).__name__, len(self))
+
+    def __eq__(self, other):
+        if isinstance(other, Vector2dArray):
+            return (memoryview(self._x) == memoryview(other._x) and
+                    memoryview(self._y) == memoryview(other._y))
+        else:
+            return NotImplemented
+
+    __hash__ = None
+
+    # Magnitudes and angles of all the points, computed in C by map().
+    def __abs__(self):
+        return array(self.typecode, map(math.hypot, self._x, self._y))
+
+    def angle(self):
+        return array(self.typecode, map(math.atan2, self._y, self._x))
+
+    def __format__(self, fmt_spec=''):
+        if fmt_spec.endswith('p'):
+            coord_spec = fmt_spec[:-1]
+            outer_fmt = '<{}, {}>'
+            pairs = zip(abs(self), self.angle())
+        else:
+            coord_spec = fmt_spec
+            outer_fmt = '({}, {})'
+            pairs = zip(self._x, self._y)
+        points = (outer_fmt.format(format(a, coord_spec),
+                                   format(b, coord_spec))
+                  for a, b in pairs)
+        return '[{}]'.format(', '.join(points))
+
+    def __bytes__(self):
+        return (bytes([ord(self.typecode)]) + bytes(self._x) +
+                bytes(self._y))
+
+    def tobytes(self):
+        return bytes(self)
+
+    @classmethod
+    def frombytes(cls, octets):
+        typecode = chr(octets[0])
+        memv = memoryview(octets)[1:].cast(typecode)
+        if len(memv) % 2:
+            msg = 'odd number of coordinates: {}'
+            raise ValueError(msg.format(len(memv)))
+        half = len(memv) // 2
+        if typecode != cls.typecode:
+            # Other widths (e.g. 'f') are converted item by item.
+            return cls.fromxy(memv[:half], memv[half:])
+        points = cls()
+        points._x.frombytes(memv[:half].cast('B'))
+        points._y.frombytes(memv[half:].cast('B'))
+        return points
+
+
+def bench(total=200000, seed=0):
+    rnd = random.Random(seed)
+    coords = [(rnd.random(), rnd.random()) for _ in range(total)]
+
+    def measure(build):
+        gc.collect()
+        tracemalloc.start()
+        points = build()
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return points, size
+
+    objects, objects_size = measure(
+        lambda: [Vector2d(x, y) for x, y in coords])
+    arrays, arrays_size = measure(lambda: Vector2dArray(coords))
+
+    def timed(func):
+        t0 = time.perf_counter()
+        func()
+        return time.perf_counter() - t0
+
+    print('{} points'.format(total))
+    print('{:>14} {:>12} {:>12}'.format('', 'list', 'Vector2dArray'))
+    print('{:>14} {:>12.1f} {:>12.1f}'.format(
+          'bytes/point', objects_size / total, arrays_size / total))
+    rows = [
+        ('abs', lambda: [abs(v) for v in objects], lambda: abs(arrays)),
+        ('angle', lambda: [v.angle() for v in objects],
+         lambda: arrays.angle()),
+        ('sum x', lambda: sum(v.x for v in objects),
+         lambda: sum(arrays.xs)),
+        ('bytes', lambda: b''.join(map(bytes, objects)),
+         lambda: bytes(arrays)),
+    ]
+    for name, on_list, on_array in rows:
+        print('{:>14} {:>11.4f}s {:>11.4f}s'.format(
+              name, timed(on_list), timed(on_array)))
+
+
+if __name__ == '__main__':
+    points = Vector2dArray([(3, 4), (1, 1)])
+    print(format(points, '.3f'))
+    print(format(points, '.3ep'))
+    assert Vector2dArray.frombytes(bytes(points)) == points
+    print()
+    bench()
@@ -0,0 +1,438 @@
+'''
+Spatial indexes for Vector2d points: a quadtree and a uniform grid.
+
+Both classes have the same interface:
+
+    - insert(point) and remove(point), for Vector2d or (x, y) pairs;
+    - query_rect(xmin, ymin, xmax, ymax): the points inside the rectangle,
+      borders included;
+    - query_radius(center, r): the points at distance <= r from center,
+      closest first;
+    - nearest(point, k=1): the k points closest to point, closest first;
+    - bulk loading: passing the points to the constructor builds the index in
+      one go, which is faster than inserting them one at a time.
+
+QuadTree splits square regions into four quadrants as leaves fill up, so it
+adapts to clustered data; its root grows to cover points inserted outside of
+it. UniformGrid hashes points into square cells of a fixed size: simpler and
+usually faster when the points are spread evenly and the cell size is close to
+the typical query radius.
+
+Leaves and cells hold (x, y, point) tuples, so the coordinates are read once,
+not through the Vector2d properties on every visit.
+
+    >>> index = QuadTree([Vector2d(0, 0), Vector2d(3, 4), Vector2d(1, 1)])
+    >>> index.nearest((2.5, 3.5))
+    [Vector2d(3.0, 4.0)]
+    >>> index.query_radius(Vector2d(0, 0), 2)
+    [Vector2d(0.0, 0.0), Vector2d(1.0, 1.0)]
+
+Run this module as a script for a mixed insert and query benchmark.
+'''
+
+import heapq
+import itertools
+import math
+import random
+import time
+
+from vector2d import Vector2d
+
+
+# An infinite or NaN coordinate fits in no quadrant and no cell: the
+#   quadtree would grow its root forever trying to cover it.
+def _entry(point):
+    if not isinstance(point, Vector2d):
+        point = Vector2d(*point)
+    if not (math.isfinite(point.x) and math.isfinite(point.y)):
+        msg = 'coordinates must be finite, got {!r}'
+        raise ValueError(msg.format(point))
+    return (point.x, point.y, point)
+
+
+def _coords(point):
+    if isinstance(point, Vector2d):
+        return point.x, point.y
+    x, y = point
+    return float(x), float(y)
+
+
+class SpatialIndex:
+    '''Behaviour shared by QuadTree and UniformGrid.'''
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        return (point for _, _, point in self._entries())
+
+    def __contains__(self, point):
+        x, y = _coords(point)
+        return any(ex == x and ey == y
+                   for ex, ey, _ in self._rect_entries(x, y, x, y))
+
+    def __repr__(self):
+        return '{}(n={})'.format(type(self).__name__, len(self))
+
+    def query_rect(self, xmin, ymin, xmax, ymax):
+        return [point for x, y, point in self._rect_entries(xmin, ymin,
+                                                            xmax, ymax)
+                if xmin <= x <= xmax and ymin <= y <= ymax]
+
+    def query_radius(self, center, r):
+        cx, cy = _coords(center)
+        found = []
+        for x, y, point in self._rect_entries(cx - r, cy - r, cx + r, cy + r):
+            dist = math.hypot(x - cx, y - cy)
+            if dist <= r:
+                found.append((dist, x, y, point))
+        found.sort(key=lambda item: item[:3])
+        return [point for *_, point in found]
+
+    def extend(self, points):
+        for point in points:
+            self.insert(point)
+
+
+class _QuadNode:
+    __slots__ = ('cx', 'cy', 'half', 'entries', 'children')
+
+    def __init__(self, cx, cy, half, entries=None):
+        self.cx = cx
+        self.cy = cy
+        self.half = half
+        # Leaves have entries, inner nodes have four children.
+        self.entries = [] if entries is None else entries
+        self.children = None
+
+    def quadrant(self, x, y):
+        return (x >= self.cx) + 2 * (y >= self.cy)
+
+    def child_center(self, quadrant):
+        quarter = self.half / 2
+        return (self.cx + (quarter if quadrant & 1 else -quarter),
+                self.cy + (quarter if quadrant & 2 else -quarter))
+
+    # Distance from (x, y) to the node's square, 0 inside it.
+    def distance(self, x, y):
+        dx = max(abs(x - self.cx) - self.half, 0.0)
+        dy = max(abs(y - self.cy) - self.half, 0.0)
+        return math.hypot(dx, dy)
+
+    def intersects(self, xmin, ymin, xmax, ymax):
+        return (xmin <= self.cx + self.half and xmax >= self.cx - self.half
+                and ymin <= self.cy + self.half and
+                ymax >= self.cy - self.half)
+
+
+class QuadTree(SpatialIndex):
+
+    # Below the maximum depth a leaf holding more than capacity points is
+    #   split; many identical points stop splitting there.
+    max_depth = 32
+
+    def __init__(self, points=(), capacity=8):
+        self.capacity = capacity
+        entries = [_entry(p) for p in points]
+        self._count = len(entries)
+        if entries:
+            xs = [x for x, _, _ in entries]
+            ys = [y for _, y, _ in entries]
+            cx = (min(xs) + max(xs)) / 2
+            cy = (min(ys) + max(ys)) / 2
+            half = max(max(xs) - min(xs), max(ys) - min(ys)) / 2 or 1.0
+            # A little margin, so points on the far border fall inside.
+            self._root = _QuadNode(cx, cy, half * (1 + 1e-9))
+            self._bulk_load(self._root, entries, 0)
+        else:
+            self._root = _QuadNode(0.0, 0.0, 1.0)
+
+    # Partition the points top-down, instead of splitting leaves as they
+    #   overflow one insert at a time.
+    def _bulk_load(self, node, entries, depth):
+        if len(entries) <= self.capacity or depth >= self.max_depth:
+            node.entries = entries
+            return
+        parts = [[], [], [], []]
+        for entry in entries:
+            parts[node.quadrant(entry[0], entry[1])].append(entry)
+        node.entries = None
+        node.children = [_QuadNode(*node.child_center(q), node.half / 2)
+                         for q in range(4)]
+        for child, part in zip(node.children, parts):
+            self._bulk_load(child, part, depth + 1)
+
+    def _contains_point(self, node, x, y):
+        return (node.cx - node.half <= x < node.cx + node.half and
+                node.cy - node.half <= y < node.cy + node.half)
+
+    # Double the root towards (x, y) until it covers it; the old root
+    #   becomes one quadrant of the new one.
+    def _grow(self, x, y):
+        while not self._contains_point(self._root, x, y):
+            old = self._root
+            cx = old.cx + (old.half if x >= old.cx else -old.half)
+            cy = old.cy + (old.half if y >= old.cy else -old.half)
+            root = _QuadNode(cx, cy, old.half * 2, entries=None)
+            root.children = [_QuadNode(*root.child_center(q), old.half)
+                             for q in range(4)]
+            # Not found by comparing centers, which rounding may change.
+            root.children[(x < old.cx) + 2 * (y < old.cy)] = old
+            self._root = root
+
+    def insert(self, point):
+        entry = _entry(point)
+        x, y, _ = entry
+        self._grow(x, y)
+        node, depth = self._root, 0
+        while node.children is not None:
+            node = node.children[node.quadrant(x, y)]
+            depth += 1
+        node.entries.append(entry)
+        self._count += 1
+        if len(node.entries) > self.capacity and depth < self.max_depth:
+            self._bulk_load(node, node.entries, depth)
+
+    # Empty leaves are left in place; they cost little and are refilled by
+    #   later inserts in the same region.
+    def remove(self, point):
+        x, y = _coords(point)
+        node = self._root
+        while node.children is not None:
+            node = node.children[node.quadrant(x, y)]
+        for i, (ex, ey, _) in enumerate(node.entries):
+            if ex == x and ey == y:
+                del node.entries[i]
+                self._count -= 1
+                return
+        msg = '{!r} not in {}'
+        raise ValueError(msg.format(point, type(self).__name__))
+
+    def _entries(self):
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node.children is None:
+                yield from node.entries
+            else:
+                stack.extend(node.children)
+
+    def _rect_entries(self, xmin, ymin, xmax, ymax):
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if not node.intersects(xmin, ymin, xmax, ymax):
+                continue
+            if node.children is None:
+                yield from node.entries
+            else:
+                stack.extend(node.children)
+
+    # Best-first search: nodes come off the heap closest first, so once the
+    #   nearest node is farther than the k-th best point the search is over.
+    def nearest(self, point, k=1):
+        x, y = _coords(point)
+        best = []
+        if k <= 0:
+            return []
+        tie = itertools.count()
+        queue = [(self._root.distance(x, y), next(tie), self._root)]
+        while queue:
+            dist, _, node = heapq.heappop(queue)
+            if len(best) == k and dist > -best[0][0]:
+                break
+            if node.children is None:
+                for ex, ey, p in node.entries:
+                    d = math.hypot(ex - x, ey - y)
+                    if len(best) < k:
+                        heapq.heappush(best, (-d, next(tie), p))
+                    elif d < -best[0][0]:
+                        heapq.heapreplace(best, (-d, next(tie), p))
+            else:
+                for child in node.children:
+                    heapq.heappush(queue, (child.distance(x, y), next(tie),
+                                           child))
+        return [p for _, _, p in sorted(best, key=lambda b: (-b[0], b[1]))]
+
+
+class UniformGrid(SpatialIndex):
+
+    # Points per cell aimed at when the cell size is derived from the data.
+    points_per_cell = 2
+
+    def __init__(self, points=(), cell_size=None):
+        entries = [_entry(p) for p in points]
+        if cell_size is None:
+            cell_size = self._cell_size_for(entries)
+        if cell_size <= 0:
+            msg = 'cell_size must be positive, not {!r}'
+            raise ValueError(msg.format(cell_size))
+        self.cell_size = cell_size
+        self._cells = {}
+        self._count = 0
+        # Range of cell indices ever used, bounding the nearest() search.
+        self._imin = self._jmin = math.inf
+        self._imax = self._jmax = -math.inf
+        for entry in entries:
+            self._add(entry)
+
+    @classmethod
+    def _cell_size_for(cls, entries):
+        if len(entries) < 2:
+            return 1.0
+        xs = [x for x, _, _ in entries]
+        ys = [y for _, y, _ in entries]
+        area = (max(xs) - min(xs)) * (max(ys) - min(ys))
+        return math.sqrt(area * cls.points_per_cell / len(entries)) or 1.0
+
+    def _key(self, x, y):
+        return (math.floor(x / self.cell_size),
+                math.floor(y / self.cell_size))
+
+    def _add(self, entry):
+        i, j = key = self._key(entry[0], entry[1])
+        self._cells.setdefault(key, []).append(entry)
+        self._count += 1
+        self._imin, self._imax = min(self._imin, i), max(self._imax, i)
+        self._jmin, self._jmax = min(self._jmin, j), max(self._jmax, j)
+
+    def insert(self, point):
+        self._add(_entry(point))
+
+    def remove(self, point):
+        x, y = _coords(point)
+        key = self._key(x, y)
+        cell = self._cells.get(key, ())
+        for i, (ex, ey, _) in enumerate(cell):
+            if ex == x and ey == y:
+                del cell[i]
+                if not cell:
+                    del self._cells[key]
+                self._count -= 1
+                return
+        msg = '{!r} not in {}'
+        raise ValueError(msg.format(point, type(self).__name__))
+
+    def _entries(self):
+        return itertools.chain.from_iterable(self._cells.values())
+
+    def _rect_entries(self, xmin, ymin, xmax, ymax):
+        imin, jmin = self._key(xmin, ymin)
+        imax, jmax = self._key(xmax, ymax)
+        # A rectangle spanning more cells than are occupied is cheaper to
+        #   answer by walking the occupied cells.
+        if (imax - imin + 1) * (jmax - jmin + 1) > len(self._cells):
+            for (i, j), cell in self._cells.items():
+                if imin <= i <= imax and jmin <= j <= jmax:
+                    yield from cell
+            return
+        cells = self._cells
+        for i in range(imin, imax + 1):
+            for j in range(jmin, jmax + 1):
+                cell = cells.get((i, j))
+                if cell:
+                    yield from cell
+
+    # Cells at Chebyshev distance `ring` from the query cell.
+    def _ring(self, qi, qj, ring):
+        if ring == 0:
+            yield (qi, qj)
+            return
+        for i in range(qi - ring, qi + ring + 1):
+            yield (i, qj - ring)
+            yield (i, qj + ring)
+        for j in range(qj - ring + 1, qj + ring):
+            yield (qi - ring, j)
+            yield (qi + ring, j)
+
+    # Visit rings of cells outwards. Every point in ring n + 1 or beyond is
+    #   at least n * cell_size away, which bounds the search.
+    def nearest(self, point, k=1):
+        x, y = _coords(point)
+        best = []
+        if not self._cells or k <= 0:
+            return []
+        qi, qj = self._key(x, y)
+        last_ring = max(qi - self._imin, self._imax - qi,
+                        qj - self._jmin, self._jmax - qj)
+        tie = itertools.count()
+        for ring in range(last_ring + 1):
+            if len(best) == k and -best[0][0] <= (ring - 1) * self.cell_size:
+                break
+            for key in self._ring(qi, qj, ring):
+                for ex, ey, p in self._cells.get(key, ()):
+                    d = math.hypot(ex - x, ey - y)
+                    if len(best) < k:
+                        heapq.heappush(best, (-d, next(tie), p))
+                    elif d < -best[0][0]:
+                        heapq.heapreplace(best, (-d, next(tie), p))
+        return [p for _, _, p in sorted(best, key=lambda b: (-b[0], b[1]))]
+
+
+class LinearScan(SpatialIndex):
+    '''Reference implementation: a list scanned on every query.'''
+
+    def __init__(self, points=()):
+        self._list = [_entry(p) for p in points]
+
+    def __len__(self):
+        return len(self._list)
+
+    def insert(self, point):
+        self._list.append(_entry(point))
+
+    def remove(self, point):
+        x, y = _coords(point)
+        for i, (ex, ey, _) in enumerate(self._list):
+            if ex == x and ey == y:
+                del self._list[i]
+                return
+        msg = '{!r} not in {}'
+        raise ValueError(msg.format(point, type(self).__name__))
+
+    def _entries(self):
+        return iter(self._list)
+
+    def _rect_entries(self, xmin, ymin, xmax, ymax):
+        return iter(self._list)
+
+    def nearest(self, point, k=1):
+        x, y = _coords(point)
+        best = heapq.nsmallest(k, ((math.hypot(ex - x, ey - y), i, p)
+                                   for i, (ex, ey, p) in
+                                   enumerate(self._list)))
+        return [p for _, _, p in best]
+
+
+def bench(total=100000, n_ops=1000, seed=0):
+    rnd = random.Random(seed)
+    points = [Vector2d(rnd.random(), rnd.random()) for _ in range(total)]
+    # Half inserts, then radius, rectangle and nearest queries, shuffled.
+    ops = (['insert'] * (n_ops // 2) + ['radius'] * (n_ops // 4) +
+           ['rect'] * (n_ops // 8) + ['nearest'] * (n_ops // 8))
+    rnd.shuffle(ops)
+    args = [(rnd.random(), rnd.random()) for _ in ops]
+
+    print('{} points, {} mixed operations'.format(total, len(ops)))
+    print('{:>12} {:>10} {:>10}'.format('index', 'build (s)', 'ops/s'))
+    for cls in (LinearScan, QuadTree, UniformGrid):
+        t0 = time.perf_counter()
+        index = cls(points)
+        build = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for op, (x, y) in zip(ops, args):
+            if op == 'insert':
+                index.insert(Vector2d(x, y))
+            elif op == 'radius':
+                index.query_radius((x, y), 0.01)
+            elif op == 'rect':
+                index.query_rect(x, y, x + 0.02, y + 0.02)
+            else:
+                index.nearest((x, y), 5)
+        elapsed = time.perf_counter() - t0
+        print('{:>12} {:>10.3f} {:>10.1f}'.format(
+              cls.__name__, build, len(ops) / elapsed))
+
+
+if __name__ == '__main__':
+    bench()
@@ -0,0 +1,66 @@
+'''
+Benchmarks for Vector.
+
+Vector caches its hash and its norm on first use. This script compares it
+with UncachedVector, which recomputes both on every call as Vector used to,
+on the two workloads that benefit most: repeated dict lookups with vectors
+as keys, and sorting by magnitude.
+'''
+
+import functools
+import math
+import operator
+import random
+import timeit
+
+from vector import Vector
+
+
+class UncachedVector(Vector):
+
+    def __hash__(self):
+        hashes = (hash(x) for x in self._components)
+        return functools.reduce(operator.xor, hashes, 0)
+
+    def __abs__(self):
+        return math.sqrt(sum(x * x for x in self))
+
+
+def make_vectors(cls, count, dim, seed=0):
+    rnd = random.Random(seed)
+    return [cls(rnd.random() for _ in range(dim)) for _ in range(count)]
+
+
+def bench_dict_lookups(vectors, rounds):
+    table = {v: i for i, v in enumerate(vectors)}
+    def lookups():
+        for _ in range(rounds):
+            for v in vectors:
+                table[v]
+    return min(timeit.repeat(lookups, number=1, repeat=3))
+
+
+def bench_sort_by_abs(vectors, rounds):
+    def sorts():
+        for _ in range(rounds):
+            sorted(vectors, key=abs)
+    return min(timeit.repeat(sorts, number=1, repeat=3))
+
+
+def main(count=100, dims=(100, 1000, 10000), rounds=10):
+    print('{} vectors, {} rounds'.format(count, rounds))
+    print('{:>7} {:>6} {:>12} {:>12} {:>8}'.format(
+          'dim', 'bench', 'uncached (s)', 'cached (s)', 'speedup'))
+    benches = {'dict': bench_dict_lookups, 'sort': bench_sort_by_abs}
+    for dim in dims:
+        slow_vectors = make_vectors(UncachedVector, count, dim)
+        fast_vectors = make_vectors(Vector, count, dim)
+        for label, bench in benches.items():
+            slow = bench(slow_vectors, rounds)
+            fast = bench(fast_vectors, rounds)
+            print('{:>7} {:>6} {:>12.4f} {:>12.4f} {:>7.1f}x'.format(
+                  dim, label, slow, fast, slow / fast))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+'''
+All-pairs distances between two collections of Vector.
+
+pairwise_distances(A, B) computes the distance from every vector of A to every
+vector of B, without the temporary Vectors that abs(a + b * -1) builds per
+pair:
+
+    - both collections are copied once into a VectorBatch;
+    - rows are visited in blocks: a block of B is unpacked into tuples and
+      then scanned by every row of a block of A while it is still in cache;
+    - math.dist (Euclidean) or a sum of products over pre-normalized rows
+      (cosine) does the per-pair work in C.
+
+The full N x M result is returned as a VectorBatch with one row per vector of
+A, or written into a preallocated buffer of N * M doubles passed as out=. Any
+writable buffer will do, including an mmap, so a result larger than memory
+can go straight to a file (see memmap_output). With top_k=k only the k
+nearest vectors of B are kept for each row of A, as lists of
+Neighbor(distance, index), and memory stays O(N * k) however large B is.
+
+    >>> from vector import Vector
+    >>> A = [Vector([0, 0]), Vector([3, 4])]
+    >>> pairwise_distances(A, metric='euclidean').dot(Vector([1, 1]))
+    array('d', [5.0, 5.0])
+    >>> pairwise_distances(A, [Vector([3, 0])], top_k=1)
+    [[Neighbor(distance=3.0, index=0)], [Neighbor(distance=4.0, index=0)]]
+'''
+
+from array import array
+import heapq
+import itertools
+import math
+import mmap
+import operator
+import os
+import random
+import tempfile
+import time
+
+from vector import Vector, VectorBatch
+from vector_index import Neighbor
+
+
+METRICS = ('euclidean', 'cosine')
+
+
+def _batch(vectors):
+    if isinstance(vectors, VectorBatch):
+        return vectors
+    return VectorBatch(vectors)
+
+
+# Every row unit-length, so cosine similarity is a plain dot product.
+def _normalized(rows):
+    normalized = []
+    for row in rows:
+        norm = math.sqrt(sum(map(operator.mul, row, row)))
+        if norm == 0:
+            raise ValueError('cosine distance is undefined for a zero vector')
+        normalized.append(tuple(x / norm for x in row))
+    return normalized
+
+
+def _distance_rows(batch_a, batch_b, metric, block_size):
+    '''Yield (i, start, distances) for every row i of A and block of B.'''
+    if metric == 'cosine':
+        prepare = _normalized
+
+        def distances(block, row):
+            return [1.0 - sum(map(operator.mul, col, row)) for col in block]
+    else:
+        def prepare(rows):
+            return [tuple(row) for row in rows]
+
+        def distances(block, row):
+            return list(map(math.dist, block, itertools.repeat(row)))
+
+    if not len(batch_a) or not len(batch_b):
+        return
+    rows_a = list(batch_a._rows())
+    rows_b = list(batch_b._rows())
+    for start_a in range(0, len(rows_a), block_size):
+        block_a = prepare(rows_a[start_a:start_a + block_size])
+        for start_b in range(0, len(rows_b), block_size):
+            block_b = prepare(rows_b[start_b:start_b + block_size])
+            for i, row in enumerate(block_a, start_a):
+                yield i, start_b, distances(block_b, row)
+
+
+def pairwise_distances(A, B=None, metric='euclidean', out=None, top_k=None,
+                       block_size=256):
+    '''Distances from every vector of A to every vector of B (default: A).'''
+    if metric not in METRICS:
+        msg = 'metric must be one of {!r}, not {!r}'
+        raise ValueError(msg.format(METRICS, metric))
+    batch_a = _batch(A)
+    batch_b = batch_a if B is None else _batch(B)
+    if len(batch_a) and len(batch_b) and batch_a.dim != batch_b.dim:
+        msg = 'vectors of length {} and {} cannot be compared'
+        raise ValueError(msg.format(batch_a.dim, batch_b.dim))
+    rows = _distance_rows(batch_a, batch_b, metric, block_size)
+    n, m = len(batch_a), len(batch_b)
+
+    if top_k is not None:
+        if out is not None:
+            raise ValueError('out and top_k cannot be used together')
+        best = [[] for _ in range(n)]
+        if top_k > 0:
+            for i, start, dists in rows:
+                candidates = zip(dists, itertools.count(start))
+                best[i] = heapq.nsmallest(top_k,
+                                          itertools.chain(best[i], candidates))
+        return [[Neighbor(*pair) for pair in found] for found in best]
+
+    if out is None:
+        components = array(VectorBatch.typecode, [0.0]) * (n * m)
+        target = memoryview(components)
+    else:
+        target = memoryview(out)
+        if target.format == 'B':
+            target = target.cast(VectorBatch.typecode)
+        if target.format != VectorBatch.typecode or target.readonly:
+            msg = 'out must be a writable buffer of doubles, not {!r}'
+            raise TypeError(msg.format(type(out).__name__))
+        if len(target) != n * m:
+            msg = 'out holds {} items, the result has {} x {} = {}'
+            raise ValueError(msg.format(len(target), n, m, n * m))
+    with target:
+        for i, start, dists in rows:
+            offset = i * m + start
+            target[offset:offset + len(dists)] = array(VectorBatch.typecode,
+                                                       dists)
+    if out is not None:
+        return out
+    # A batch needs rows of at least one component.
+    return VectorBatch.frombuffer(components, m) if m else VectorBatch(())
+
+
+def memmap_output(path, rows, cols):
+    '''A writable mmap of a new file sized for a rows x cols result.'''
+    with open(path, 'w+b') as fp:
+        fp.truncate(rows * cols * array(VectorBatch.typecode).itemsize)
+        # The mapping stays valid after the file object is closed.
+        return mmap.mmap(fp.fileno(), 0)
+
+
+def naive_distances(A, B):
+    '''Reference implementation: abs(a + b * -1) for every pair.'''
+    return [[abs(a + b * -1) for b in B] for a in A]
+
+
+if __name__ == '__main__':
+    rnd = random.Random(0)
+    n, m, dim = 200, 300, 64
+    A = [Vector(rnd.random() for _ in range(dim)) for _ in range(n)]
+    B = [Vector(rnd.random() for _ in range(dim)) for _ in range(m)]
+
+    t0 = time.perf_counter()
+    expected = naive_distances(A, B)
+    naive = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    result = pairwise_distances(A, B)
+    blocked = time.perf_counter() - t0
+    assert all(math.isclose(x, y) for row, expected_row
+               in zip(result, expected) for x, y in zip(row, expected_row))
+    print('{} x {}, dim {}: naive {:.3f}s, blocked {:.3f}s ({:.1f}x)'.format(
+          n, m, dim, naive, blocked, naive / blocked))
+
+    t0 = time.perf_counter()
+    pairwise_distances(A, B, metric='cosine', top_k=5)
+    print('cosine, top 5 per row: {:.3f}s'.format(time.perf_counter() - t0))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'distances.bin')
+        out = memmap_output(path, n, m)
+        pairwise_distances(A, B, out=out)
+        out.flush()
+        out.close()
+        print('memory-mapped result: {} bytes in {}'.format(
+              os.path.getsize(path), os.path.basename(path)))
@@ -0,0 +1,223 @@
+'''
+Lazy, fused evaluation of Vector arithmetic.
+
+An expression like a + b * 3 - c on plain Vectors builds a temporary Vector
+for every operator. Wrapping the operands with lazy() makes the operators
+build a small expression tree instead:
+
+    >>> from vector import Vector
+    >>> a, b, c = lazy(Vector([1, 2]), Vector([3, 4]), Vector([5, 6]))
+    >>> expr = a + b * 3 - c
+    >>> expr
+    LazyVector('v0 + v1 * c0 - v2')
+    >>> expr.materialize()
+    Vector([5.0, 8.0])
+
+The tree is compiled once into a single lambda, and map() applies it to all
+the operands' buffers in one pass, with no intermediate Vector. That happens
+on materialize(), or when abs(), == or iteration needs the values.
+Plain Vectors and numbers mixed into the expression are picked up as
+operands, on either side: lazy(a) + b and b * 3 + lazy(c) are both lazy.
+'''
+
+import functools
+import itertools
+import numbers
+
+from vector import Vector, promote
+
+
+# Operator precedence, to put parentheses only where they are needed.
+_PRECEDENCE = {'+': 1, '-': 1, '*': 2, '/': 2, 'neg': 3, 'leaf': 4}
+
+
+class LazyVector:
+
+    # Tells Vector.__add__ and Vector.__matmul__ to defer to our reflected
+    #   methods instead of evaluating the expression eagerly.
+    _lazy = True
+
+    def __add__(self, other):
+        return _BinOp('+', self, _wrap(other))
+
+    def __radd__(self, other):
+        return _BinOp('+', _wrap(other), self)
+
+    def __sub__(self, other):
+        return _BinOp('-', self, _wrap(other))
+
+    def __rsub__(self, other):
+        return _BinOp('-', _wrap(other), self)
+
+    # As with Vector, only scaling by a number is supported.
+    def __mul__(self, scalar):
+        if isinstance(scalar, numbers.Real):
+            return _BinOp('*', self, _Const(scalar))
+        else:
+            return NotImplemented
+
+    def __rmul__(self, scalar):
+        return self * scalar
+
+    def __truediv__(self, scalar):
+        if isinstance(scalar, numbers.Real):
+            return _BinOp('/', self, _Const(scalar))
+        else:
+            return NotImplemented
+
+    # A dot product is a reduction, not a vector: evaluate, then reduce.
+    def __matmul__(self, other):
+        return self.materialize() @ other
+
+    def __rmatmul__(self, other):
+        return other @ self.materialize()
+
+    def __neg__(self):
+        return _Neg(self)
+
+    def __pos__(self):
+        return self
+
+    def __repr__(self):
+        source, _, _ = self._compile()
+        return '{}({!r})'.format(LazyVector.__name__, source)
+
+    # Walk the tree once, giving every distinct leaf and constant a name.
+    def _compile(self):
+        leaves, consts = {}, []
+        source = self._emit(leaves, consts)
+        return source, list(leaves.values()), consts
+
+    def materialize(self):
+        source, leaves, consts = self._compile()
+        func = _lambda_factory(source, len(leaves), len(consts))(*consts)
+        typecode = functools.reduce(
+            promote, (getattr(v, 'typecode', Vector.typecode) for v in leaves))
+        buffers = [v._components if isinstance(v, Vector) else v
+                   for v in leaves]
+        if len(set(map(len, leaves))) == 1:
+            values = map(func, *buffers)
+        else:
+            # Same padding rule as Vector.__add__.
+            pairs = itertools.zip_longest(*buffers, fillvalue=0.0)
+            values = itertools.starmap(func, pairs)
+        return Vector(values, typecode)
+
+    def __iter__(self):
+        return iter(self.materialize())
+
+    def __len__(self):
+        return max(map(len, self._compile()[1]))
+
+    def __abs__(self):
+        return abs(self.materialize())
+
+    def __eq__(self, other):
+        if isinstance(other, LazyVector):
+            other = other.materialize()
+        return self.materialize() == other
+
+    __hash__ = None
+
+
+class _Leaf(LazyVector):
+
+    precedence = _PRECEDENCE['leaf']
+
+    def __init__(self, vector):
+        self.vector = vector
+
+    def _emit(self, leaves, consts):
+        # The same vector used twice is one argument of the lambda.
+        leaves.setdefault(id(self.vector), self.vector)
+        return 'v{}'.format(list(leaves).index(id(self.vector)))
+
+
+class _Const(LazyVector):
+
+    precedence = _PRECEDENCE['leaf']
+
+    def __init__(self, value):
+        self.value = value
+
+    def _emit(self, leaves, consts):
+        consts.append(self.value)
+        return 'c{}'.format(len(consts) - 1)
+
+
+class _Neg(LazyVector):
+
+    precedence = _PRECEDENCE['neg']
+
+    def __init__(self, operand):
+        self.operand = operand
+
+    def _emit(self, leaves, consts):
+        source = self.operand._emit(leaves, consts)
+        if self.operand.precedence < self.precedence:
+            source = '({})'.format(source)
+        return '-' + source
+
+
+class _BinOp(LazyVector):
+
+    def __init__(self, op, left, right):
+        self.op = op
+        self.precedence = _PRECEDENCE[op]
+        self.left = left
+        self.right = right
+
+    def _emit(self, leaves, consts):
+        left = self.left._emit(leaves, consts)
+        right = self.right._emit(leaves, consts)
+        if self.left.precedence < self.precedence:
+            left = '({})'.format(left)
+        # a - (b + c) and a / (b * c) need the parentheses on the right.
+        if self.right.precedence <= self.precedence:
+            right = '({})'.format(right)
+        return '{} {} {}'.format(left, self.op, right)
+
+
+# Scalars only make sense next to vectors; anything else iterable becomes
+#   a leaf.
+def _wrap(operand):
+    if isinstance(operand, LazyVector):
+        return operand
+    if isinstance(operand, numbers.Real):
+        return _Const(operand)
+    if not isinstance(operand, Vector):
+        operand = Vector(operand)
+    return _Leaf(operand)
+
+
+# Expressions of the same shape compile to the same source, so each shape
+#   is turned into a function only once. Constants are bound by calling the
+#   factory, the vectors' components are the lambda's arguments.
+@functools.lru_cache(maxsize=256)
+def _lambda_factory(source, n_leaves, n_consts):
+    consts = ', '.join('c{}'.format(i) for i in range(n_consts))
+    args = ', '.join('v{}'.format(i) for i in range(n_leaves))
+    return eval('lambda {}: lambda {}: {}'.format(consts, args, source))
+
+
+# Wrap one or more vectors for lazy evaluation.
+def lazy(*vectors):
+    leaves = tuple(_Leaf(v) for v in vectors)
+    return leaves[0] if len(leaves) == 1 else leaves
+
+
+if __name__ == '__main__':
+    import timeit
+
+    dim = 100000
+    a, b, c = (Vector(range(i, dim + i)) for i in range(3))
+    la, lb, lc = lazy(a, b, c)
+    expr = la + lb * 3 - lc
+    print(expr)
+    assert expr.materialize() == a + b * 3 + c * -1
+    eager = min(timeit.repeat(lambda: a + b * 3 + c * -1,
+                              number=10, repeat=3))
+    fused = min(timeit.repeat(lambda: (la + lb * 3 - lc).materialize(),
+                              number=10, repeat=3))
+    print('dim {}: eager {:.4f}s, fused {:.4f}s ({:.1f}x)'.format(
+          dim, eager / 10, fused / 10, eager / fused))
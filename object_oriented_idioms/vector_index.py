@@ -0,0 +1,245 @@
+'''
+Exact nearest-neighbour search over collections of Vector.
+
+VectorIndex copies the vectors once into a VectorBatch and answers k-nearest
+and fixed-radius queries (Euclidean distance) without building a temporary
+Vector per candidate:
+
+    - for low dimensions it builds a KD-tree, which prunes whole regions of
+      space whose bounding slab is farther than the current k-th neighbour;
+    - for high dimensions, where a KD-tree degenerates into a slow linear
+      scan, it does a blocked linear scan: rows are visited in blocks, and
+      math.dist computes every distance of a block in C. Batch queries walk
+      each block once for all the queries, while it is still in cache.
+
+Results are lists of Neighbor(distance, index) tuples, closest first, where
+index is the position of the vector in the sequence the index was built from.
+
+Run this module as a script for build time and query throughput figures.
+'''
+
+from collections import namedtuple
+import heapq
+import itertools
+import math
+import random
+import time
+
+from vector import Vector, VectorBatch
+
+
+Neighbor = namedtuple('Neighbor', 'distance index')
+
+# Above this dimension the KD-tree stops paying for itself.
+KDTREE_MAX_DIM = 10
+
+
+class _KDNode:
+    __slots__ = ('axis', 'split', 'left', 'right', 'indices')
+
+    def __init__(self, axis=None, split=None, left=None, right=None,
+                 indices=None):
+        self.axis = axis
+        self.split = split
+        self.left = left
+        self.right = right
+        # Only leaves carry indices.
+        self.indices = indices
+
+
+class VectorIndex:
+
+    def __init__(self, vectors, method='auto', leaf_size=16, block_size=1024):
+        self._batch = VectorBatch(vectors)
+        self.dim = self._batch.dim
+        if method == 'auto':
+            method = 'kdtree' if self.dim <= KDTREE_MAX_DIM else 'blocked'
+        if method not in ('kdtree', 'blocked'):
+            msg = "method must be 'auto', 'kdtree' or 'blocked', not {!r}"
+            raise ValueError(msg.format(method))
+        self.method = method
+        self.leaf_size = leaf_size
+        self.block_size = block_size
+        # Rows as read-only memoryviews over the batch buffer, no copy.
+        self._rows = [row._components for row in self._batch]
+        if method == 'kdtree':
+            # Tuples index faster than memoryviews in the tree walk, and
+            #   in low dimensions they cost little memory.
+            self._points = [tuple(row) for row in self._rows]
+            self._root = self._build(list(range(len(self._rows))), 0)
+
+    def __len__(self):
+        return len(self._batch)
+
+    def __repr__(self):
+        return '{}(n={}, dim={}, method={!r})'.format(
+            type(self).__name__, len(self), self.dim, self.method)
+
+    def _query_point(self, query):
+        if isinstance(query, Vector):
+            query = query._components
+        point = tuple(map(float, query))
+        # An empty index has no dimension of its own to check against.
+        if len(self) and len(point) != self.dim:
+            msg = 'query has length {}, index dimension is {}'
+            raise ValueError(msg.format(len(point), self.dim))
+        return point
+
+    # Recursive median split, cycling through the axes.
+    def _build(self, indices, depth):
+        if len(indices) <= self.leaf_size:
+            return _KDNode(indices=indices)
+        axis = depth % self.dim
+        points = self._points
+        indices.sort(key=lambda i: points[i][axis])
+        mid = len(indices) // 2
+        return _KDNode(axis=axis, split=points[indices[mid]][axis],
+                       left=self._build(indices[:mid], depth + 1),
+                       right=self._build(indices[mid:], depth + 1))
+
+    def knn(self, query, k=1):
+        point = self._query_point(query)
+        if self.method == 'kdtree':
+            return self._kdtree_knn(point, k)
+        return self._blocked_knn([point], k)[0]
+
+    def radius(self, query, r):
+        point = self._query_point(query)
+        if self.method == 'kdtree':
+            return self._kdtree_radius(point, r)
+        return self._blocked_radius([point], r)[0]
+
+    # Batch queries return one result list per query, in order.
+    def knn_many(self, queries, k=1):
+        points = [self._query_point(q) for q in queries]
+        if self.method == 'kdtree':
+            return [self._kdtree_knn(p, k) for p in points]
+        return self._blocked_knn(points, k)
+
+    def radius_many(self, queries, r):
+        points = [self._query_point(q) for q in queries]
+        if self.method == 'kdtree':
+            return [self._kdtree_radius(p, r) for p in points]
+        return self._blocked_radius(points, r)
+
+    # Each block of rows is unpacked into tuples once, then scanned by every
+    #   query while it is still in cache. math.dist and heapq.nsmallest do
+    #   the per-row work in C.
+    def _blocks(self):
+        rows = self._rows
+        for start in range(0, len(rows), self.block_size):
+            block = rows[start:start + self.block_size]
+            yield start, [tuple(row) for row in block]
+
+    def _blocked_knn(self, points, k):
+        best = [[] for _ in points]
+        if k <= 0:
+            return best
+        for start, block in self._blocks():
+            for q, point in enumerate(points):
+                dists = map(math.dist, block, itertools.repeat(point))
+                candidates = zip(dists, itertools.count(start))
+                best[q] = heapq.nsmallest(k, itertools.chain(best[q],
+                                                             candidates))
+        return [[Neighbor(*pair) for pair in found] for found in best]
+
+    def _blocked_radius(self, points, r):
+        results = [[] for _ in points]
+        for start, block in self._blocks():
+            for point, found in zip(points, results):
+                dists = map(math.dist, block, itertools.repeat(point))
+                found.extend(Neighbor(dist, i)
+                             for i, dist in enumerate(dists, start)
+                             if dist <= r)
+        for found in results:
+            found.sort()
+        return results
+
+    def _kdtree_knn(self, point, k):
+        points = self._points
+        heap = []
+
+        def search(node):
+            if node.indices is not None:
+                for i in node.indices:
+                    dist = math.dist(points[i], point)
+                    if len(heap) < k:
+                        heapq.heappush(heap, (-dist, -i))
+                    elif -dist > heap[0][0]:
+                        heapq.heapreplace(heap, (-dist, -i))
+                return
+            diff = point[node.axis] - node.split
+            near, far = ((node.left, node.right) if diff < 0
+                         else (node.right, node.left))
+            search(near)
+            # The far side can only help if the splitting plane is closer
+            #   than the current k-th neighbour.
+            if len(heap) < k or abs(diff) <= -heap[0][0]:
+                search(far)
+
+        if k > 0:
+            search(self._root)
+        return sorted(Neighbor(-d, -i) for d, i in heap)
+
+    def _kdtree_radius(self, point, r):
+        points = self._points
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node.indices is not None:
+                for i in node.indices:
+                    dist = math.dist(points[i], point)
+                    if dist <= r:
+                        found.append(Neighbor(dist, i))
+                continue
+            diff = point[node.axis] - node.split
+            if diff <= r:
+                stack.append(node.left)
+            if diff >= -r:
+                stack.append(node.right)
+        found.sort()
+        return found
+
+
+def linear_knn(vectors, query, k=1):
+    '''Reference implementation: one Vector.distance call per vector.'''
+    dists = ((query.distance(v), i) for i, v in enumerate(vectors))
+    return [Neighbor(*pair) for pair in heapq.nsmallest(k, dists)]
+
+
+def bench(n=20000, dims=(2, 3, 8, 32, 256), n_queries=100, k=10, seed=0):
+    rnd = random.Random(seed)
+    print('{} vectors, {} queries, k={}'.format(n, n_queries, k))
+    print('{:>5} {:>8} {:>10} {:>12}'.format(
+          'dim', 'method', 'build (s)', 'queries/s'))
+    for dim in dims:
+        vectors = [Vector(rnd.random() for _ in range(dim)) for _ in range(n)]
+        queries = [Vector(rnd.random() for _ in range(dim))
+                   for _ in range(n_queries)]
+
+        t0 = time.perf_counter()
+        for q in queries:
+            linear_knn(vectors, q, k)
+        elapsed = time.perf_counter() - t0
+        print('{:>5} {:>8} {:>10} {:>12.1f}'.format(
+              dim, 'linear', '-', n_queries / elapsed))
+
+        for method in ('kdtree', 'blocked'):
+            t0 = time.perf_counter()
+            index = VectorIndex(vectors, method=method)
+            build = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            index.knn_many(queries, k)
+            elapsed = time.perf_counter() - t0
+            print('{:>5} {:>8} {:>10.3f} {:>12.1f}'.format(
+                  dim, method, build, n_queries / elapsed))
+
+
+if __name__ == '__main__':
+    index = VectorIndex([Vector([x, y]) for x in range(5) for y in range(5)])
+    print(index)
+    print(index.knn([1.2, 3.1], k=3))
+    print(index.radius(Vector([0, 0]), 1))
+    print()
+    bench()
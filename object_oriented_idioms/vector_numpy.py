@@ -0,0 +1,244 @@
+'''
+A NumPy storage engine for Vector.
+
+NumpyVector keeps the public API of Vector (iteration, slicing, the 'xyzt'
+shortcuts, __bytes__/frombytes, __format__), but stores the components in a
+numpy.ndarray. Every arithmetic and reduction operator then becomes a single
+vectorized call instead of a Python-level generator over the elements.
+
+The backend is selected by picking the class, either directly or through the
+BACKENDS mapping:
+
+    >>> cls = BACKENDS['numpy']
+    >>> cls([3, 4])
+    NumpyVector([3.0, 4.0])
+
+Run this module as a script to compare both backends across dimensions.
+'''
+
+from array import array
+import functools
+import numbers
+import operator
+import reprlib
+import timeit
+
+import numpy as np
+
+from vector import Vector
+
+
+class NumpyVector(Vector):
+
+    def __init__(self, components, typecode=None):
+        if isinstance(components, Vector):
+            components = components._components
+        # Anything exporting the buffer protocol (array, memoryview, ndarray)
+        #   is copied in one go. Other iterables, generators included, are
+        #   consumed by fromiter without building an intermediate list.
+        try:
+            buf = memoryview(components)
+        except TypeError:
+            typecode = self._typecode_for(components, typecode)
+            arr = np.fromiter(components, dtype=typecode)
+        else:
+            typecode = self._typecode_for(buf, typecode)
+            arr = np.array(buf, dtype=typecode)
+        self.typecode = typecode
+        self._components = arr
+
+    # Alternative constructor wrapping an ndarray produced by numpy itself,
+    #   so the result of an operator is not copied a second time.
+    # numpy already promotes float32 and float64 operands, so the typecode
+    #   is read back from the dtype of the result.
+    @classmethod
+    def _fromndarray(cls, arr):
+        vec = cls.__new__(cls)
+        vec.typecode = arr.dtype.char
+        vec._components = arr
+        return vec
+
+    # Views over a buffer stay views: numpy wraps the memoryview directly.
+    @classmethod
+    def _fromview(cls, memv):
+        return cls._fromndarray(np.asarray(memv))
+
+    # Any operand that is not a NumpyVector is converted once, then numpy
+    #   does the rest. Vector operands share their buffer, no copy, even
+    #   when it is a strided memoryview.
+    def _coerce(self, other):
+        if isinstance(other, NumpyVector):
+            return other._components
+        if isinstance(other, Vector):
+            return np.asarray(other._components)
+        return np.fromiter(other, dtype=self.typecode)
+
+    # tolist() unboxes to Python floats in C, so iteration (and str, format,
+    #   tuple(v)...) yields float rather than numpy.float64, as with Vector.
+    def __iter__(self):
+        return iter(self._components.tolist())
+
+    def __repr__(self):
+        # reprlib only needs a handful of items to build its abbreviation.
+        components = reprlib.repr(array(self.typecode, self._components[:6]))
+        components = components[components.find('['):-1]
+        if self.typecode != Vector.typecode:
+            components += ', typecode={!r}'.format(self.typecode)
+        return '{}({})'.format(type(self).__name__, components)
+
+    def __bytes__(self):
+        return (bytes([ord(self.typecode)]) +
+                self._components.tobytes())
+
+    def __eq__(self, other):
+        if isinstance(other, Vector):
+            return len(self) == len(other) and \
+                bool(np.array_equal(self._components, self._coerce(other)))
+        else:
+            return NotImplemented
+
+    # Same rule as math.isclose: equal values (infinities included) are
+    #   close, otherwise both must be finite and within tolerance.
+    def allclose(self, other, rel_tol=1e-09, abs_tol=0.0):
+        try:
+            theirs = self._coerce(other)
+        except (TypeError, ValueError):
+            return False
+        mine = self._components
+        if len(mine) != len(theirs):
+            return False
+        tolerance = np.maximum(
+            rel_tol * np.maximum(np.abs(mine), np.abs(theirs)), abs_tol)
+        with np.errstate(invalid='ignore'):
+            close = (mine == theirs) | (np.isfinite(mine) &
+                                        np.isfinite(theirs) &
+                                        (np.abs(mine - theirs) <= tolerance))
+        return bool(close.all())
+
+    # Both results are cached, as in Vector.
+    def __hash__(self):
+        if self._hash is None:
+            # Must agree with Vector.__hash__ so that equal vectors of both
+            #   backends hash the same. tolist() unboxes the array in C.
+            hashes = map(hash, self._components.tolist())
+            self._hash = functools.reduce(operator.xor, hashes, 0)
+        return self._hash
+
+    def __abs__(self):
+        if self._norm is None:
+            comps = self._components
+            self._norm = float(np.sqrt(np.dot(comps, comps)))
+        return self._norm
+
+    def __neg__(self):
+        return self._fromndarray(-self._components)
+
+    def __pos__(self):
+        return self._fromndarray(self._components.copy())
+
+    # Same semantics as Vector.__add__: the shorter operand is padded with
+    #   zeros, and non-numeric iterables make us return NotImplemented.
+    def __add__(self, other):
+        try:
+            theirs = self._coerce(other)
+        except (TypeError, ValueError):
+            return NotImplemented
+        mine = self._components
+        if len(mine) == len(theirs):
+            return self._fromndarray(mine + theirs)
+        result = np.zeros(max(len(mine), len(theirs)),
+                          dtype=np.result_type(mine, theirs))
+        result[:len(mine)] += mine
+        result[:len(theirs)] += theirs
+        return self._fromndarray(result)
+
+    # float() first: a Fraction or Decimal would give an object array.
+    def __mul__(self, scalar):
+        if isinstance(scalar, numbers.Real):
+            return self._fromndarray(self._components * float(scalar))
+        else:
+            return NotImplemented
+
+    def __matmul__(self, other):
+        try:
+            theirs = self._coerce(other)
+        except (TypeError, ValueError):
+            return NotImplemented
+        size = min(len(self._components), len(theirs))
+        return float(np.dot(self._components[:size], theirs[:size]))
+
+    def distance(self, other):
+        theirs = self._coerce(other)
+        if len(theirs) != len(self._components):
+            return super().distance(other)
+        return float(np.linalg.norm(self._components - theirs))
+
+    def __getitem__(self, index):
+        cls = type(self)
+        if isinstance(index, slice):
+            # Basic numpy slicing already returns a view.
+            return cls._fromndarray(self._components[index])
+        elif isinstance(index, numbers.Integral):
+            return float(self._components[index])
+        else:
+            msg = '{cls.__name__} indices must be integers'
+            raise TypeError(msg.format(cls=cls))
+
+    def __getattr__(self, name):
+        cls = type(self)
+        if len(name) == 1:
+            pos = cls.shortcut_names.find(name)
+            if 0 <= pos < len(self._components):
+                return float(self._components[pos])
+        msg = '{.__name__!r} object has no attribute {!r}'
+        raise AttributeError(msg.format(cls, name))
+
+
+BACKENDS = {
+    'array': Vector,
+    'numpy': NumpyVector,
+}
+
+
+BENCH_DIMS = (10, 1000, 100000, 1000000)
+
+BENCH_OPS = {
+    'add': 'v + w',
+    'mul': 'v * 3.0',
+    'neg': '-v',
+    'abs': 'abs(v)',
+    'eq':  'v == w',
+    'close': 'v.allclose(w)',
+    'dot': 'v @ w',
+}
+
+
+def bench(dims=BENCH_DIMS, ops=BENCH_OPS, repeat=3):
+    print('{:>8} {:>5} {:>12} {:>12} {:>8}'.format(
+          'dim', 'op', 'array (s)', 'numpy (s)', 'speedup'))
+    for dim in dims:
+        # Fewer loops for bigger vectors so every cell takes about as long.
+        number = max(1, 100000 // dim)
+        timings = {}
+        for label, cls in BACKENDS.items():
+            env = {'v': cls(range(dim)), 'w': cls(range(dim))}
+            for op, stmt in ops.items():
+                best = min(timeit.repeat(stmt, globals=env,
+                                         number=number, repeat=repeat))
+                timings[label, op] = best / number
+        for op in ops:
+            slow, fast = timings['array', op], timings['numpy', op]
+            print('{:>8} {:>5} {:>12.6f} {:>12.6f} {:>7.1f}x'.format(
+                  dim, op, slow, fast, slow / fast))
+
+
+if __name__ == '__main__':
+    v1 = NumpyVector(range(6))
+    print(repr(v1))
+    print(v1)
+    print(repr(v1[3:9]), v1.x, v1.t)
+    print(format(NumpyVector([1, 1, 1]), '.3fh'))
+    print(NumpyVector.frombytes(bytes(v1)) == v1 == Vector(range(6)))
+    print(hash(v1) == hash(Vector(range(6))))
+    print()
+    bench()
@@ -0,0 +1,210 @@
+'''
+Multi-core reductions for very large Vectors.
+
+SharedVector is an opt-in Vector whose components live in a
+multiprocessing.shared_memory block instead of a private array. Its
+reductions -- abs(), hash(), == and @ against another SharedVector -- are
+split into fixed-size chunks, each chunk is reduced by a worker process that
+attaches to the shared block by name (no component is pickled), and the
+partial results are combined in chunk order:
+
+    - hash: xor of the per-chunk xors, which is exactly Vector.__hash__;
+    - abs and @: math.fsum of per-chunk math.fsum results;
+    - ==: all() of per-chunk memoryview comparisons.
+
+Chunk boundaries depend only on chunk_size, never on the number of workers,
+so the results are the same whatever the pool size, and with no executor
+at all (the chunks are then reduced in-process).
+
+    >>> from concurrent import futures
+    >>> with futures.ProcessPoolExecutor() as executor:
+    ...     with SharedVector(range(10**7), executor=executor) as v:
+    ...         norm = abs(v)
+
+Run this module as a script for a scaling benchmark by worker count.
+'''
+
+from concurrent import futures
+import functools
+import math
+from multiprocessing import shared_memory
+import operator
+import os
+import sys
+import time
+
+from vector import Vector
+
+
+CHUNK_SIZE = 1 << 20
+
+
+# Runs in the worker processes. The block is attached for the duration of
+#   one chunk only, so a long-lived pool keeps no mapping of vectors that
+#   have been closed in the parent.
+def _reduce_chunk(op, typecode, start, stop, name, other_name=None):
+    blocks = [shared_memory.SharedMemory(name=name)]
+    if other_name is not None:
+        blocks.append(shared_memory.SharedMemory(name=other_name))
+    views = [block.buf.cast(typecode)[start:stop] for block in blocks]
+    try:
+        mine = views[0]
+        if op == 'sumsq':
+            return math.fsum(map(operator.mul, mine, mine))
+        elif op == 'hash':
+            return functools.reduce(operator.xor, map(hash, mine), 0)
+        theirs = views[1]
+        if op == 'dot':
+            return math.fsum(map(operator.mul, mine, theirs))
+        elif op == 'eq':
+            return mine == theirs
+        raise ValueError('unknown reduction {!r}'.format(op))
+    finally:
+        # Views must go before the blocks can be closed.
+        for view in views:
+            view.release()
+        for block in blocks:
+            block.close()
+
+
+class SharedVector(Vector):
+
+    def __init__(self, components, typecode=None, executor=None,
+                 chunk_size=CHUNK_SIZE):
+        if not isinstance(components, Vector) or typecode is not None:
+            components = Vector(components, typecode)
+        source = memoryview(components._components)
+        if not source.contiguous:
+            source = memoryview(source.tobytes()).cast(source.format)
+        # A zero-sized block is not allowed, so empty vectors get one byte.
+        self._shm = shared_memory.SharedMemory(create=True,
+                                               size=max(source.nbytes, 1))
+        self._shm.buf[:source.nbytes] = source.cast('B')
+        self.typecode = components.typecode
+        self._components = self._shm.buf[:source.nbytes].cast(self.typecode)
+        self.executor = executor
+        self.chunk_size = chunk_size
+
+    # Slices must not keep the shared block alive, so they are copies.
+    @classmethod
+    def _fromview(cls, memv):
+        return Vector(memv)
+
+    def copy(self):
+        return type(self)(self, executor=self.executor,
+                          chunk_size=self.chunk_size)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def _map_chunks(self, op, other=None):
+        other_name = other.name if other is not None else None
+        calls = [(op, self.typecode, start, start + self.chunk_size,
+                  self.name, other_name)
+                 for start in range(0, len(self), self.chunk_size)]
+        if self.executor is None:
+            return [_reduce_chunk(*args) for args in calls]
+        # map() yields results in submission order, which keeps the
+        #   combination deterministic.
+        return list(self.executor.map(_reduce_chunk, *zip(*calls)))
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = functools.reduce(operator.xor,
+                                          self._map_chunks('hash'), 0)
+        return self._hash
+
+    def __abs__(self):
+        if self._norm is None:
+            self._norm = math.sqrt(math.fsum(self._map_chunks('sumsq')))
+        return self._norm
+
+    def _is_peer(self, other):
+        return (isinstance(other, SharedVector) and
+                other.typecode == self.typecode and len(other) == len(self))
+
+    def __eq__(self, other):
+        if self._is_peer(other):
+            return all(self._map_chunks('eq', other))
+        return super().__eq__(other)
+
+    def __matmul__(self, other):
+        if self._is_peer(other):
+            return math.fsum(self._map_chunks('dot', other))
+        return super().__matmul__(other)
+
+    # Releases the shared block. The SharedVector is unusable afterwards.
+    def close(self):
+        if self._shm is not None:
+            self._components.release()
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    # Like a file object, a SharedVector collected without being closed
+    #   releases its block.
+    def __del__(self):
+        if getattr(self, '_shm', None) is not None:
+            self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.close()
+
+
+def bench(dim=4000000, max_workers=None, repeat=3):
+    max_workers = max_workers or os.cpu_count()
+    workers_list = sorted({1 << i for i in range(max_workers.bit_length())} |
+                          {max_workers})
+    plain = Vector(range(dim))
+    other = Vector(range(dim))
+    ops = {
+        'abs': lambda v, w: abs(v),
+        'hash': lambda v, w: hash(v),
+        'eq': lambda v, w: v == w,
+        'dot': lambda v, w: v @ w,
+    }
+
+    def best_of(func, make_pair):
+        timings = []
+        for _ in range(repeat):
+            # Fresh vectors each time, or cached hash and norm would win.
+            v, w = make_pair()
+            t0 = time.perf_counter()
+            func(v, w)
+            timings.append(time.perf_counter() - t0)
+        return min(timings)
+
+    print('dim {}'.format(dim))
+    print('{:>8} {:>6} {:>10} {:>8}'.format('workers', 'op', 'time (s)',
+                                             'speedup'))
+    baseline = {}
+    for op, func in ops.items():
+        baseline[op] = best_of(func, lambda: (Vector(plain), other))
+        print('{:>8} {:>6} {:>10.3f} {:>8}'.format('serial', op,
+                                                   baseline[op], '-'))
+    shared_other = SharedVector(other)
+    for workers in workers_list:
+        with futures.ProcessPoolExecutor(workers) as executor:
+            shared_other.executor = executor
+            for op, func in ops.items():
+                created = []
+
+                def make_pair():
+                    v = SharedVector(plain, executor=executor)
+                    created.append(v)
+                    return v, shared_other
+
+                elapsed = best_of(func, make_pair)
+                for v in created:
+                    v.close()
+                print('{:>8} {:>6} {:>10.3f} {:>7.1f}x'.format(
+                      workers, op, elapsed, baseline[op] / elapsed))
+    shared_other.close()
+
+
+if __name__ == '__main__':
+    bench(*map(int, sys.argv[1:2]))
@@ -0,0 +1,217 @@
+'''
+Streaming mean, variance and covariance of Vectors.
+
+The centroid of a stream computed as sum(vectors, Vector([0] * dim)) builds a
+new Vector for every step, and a naive sum of squares loses precision when the
+spread is small next to the mean. VectorStats keeps running accumulators in
+arrays it updates in place:
+
+    - single vectors are added with Welford's update: mean and sums of squared
+      deviations move by the deviation of the new vector from the current mean;
+    - a VectorBatch is reduced as a chunk (two passes over its buffer) and
+      merged in one step;
+    - merge() combines accumulators with Chan et al.'s pairwise formula, so
+      shards of a stream can be reduced separately and then joined.
+
+    >>> from vector import Vector
+    >>> stats = VectorStats(covariance=True)
+    >>> stats.update([Vector([1, 2]), Vector([3, 2]), Vector([5, 8])])
+    >>> stats.mean
+    Vector([3.0, 4.0])
+    >>> stats.variance()
+    Vector([2.6666666666666665, 8.0])
+    >>> stats.covariance(ddof=1)[0]
+    Vector([4.0, 6.0])
+'''
+
+from array import array
+import functools
+import itertools
+import operator
+import random
+import time
+
+from vector import Vector, VectorBatch
+
+
+class VectorStats:
+    typecode = 'd'
+
+    def __init__(self, dim=None, covariance=False):
+        self.count = 0
+        self.dim = dim
+        self.track_covariance = covariance
+        self._mean = None
+        self._m2 = None
+        # Rows of the co-moment matrix, sums of products of deviations.
+        self._comoment = None
+        if dim is not None:
+            self._reset(dim)
+
+    def _reset(self, dim):
+        self.dim = dim
+        zeros = array(self.typecode, [0.0]) * dim
+        self._mean = array(self.typecode, zeros)
+        self._m2 = array(self.typecode, zeros)
+        if self.track_covariance:
+            self._comoment = [array(self.typecode, zeros) for _ in range(dim)]
+
+    def __repr__(self):
+        return '{}(count={}, dim={}, covariance={})'.format(
+            type(self).__name__, self.count, self.dim, self.track_covariance)
+
+    def _check_dim(self, dim):
+        if self.dim is None:
+            self._reset(dim)
+        elif dim != self.dim:
+            msg = 'expected vectors of length {}, got {}'
+            raise ValueError(msg.format(self.dim, dim))
+
+    # A VectorBatch is a chunk; anything else is one vector.
+    def add(self, vector):
+        if isinstance(vector, VectorBatch):
+            if len(vector):
+                self.merge(type(self)._fromchunk(vector,
+                                                 self.track_covariance))
+            return
+        x = vector._components if isinstance(vector, Vector) else list(vector)
+        self._check_dim(len(x))
+        self.count += 1
+        delta = list(map(operator.sub, x, self._mean))
+        factor = itertools.repeat(1 / self.count)
+        self._mean[:] = array(self.typecode, map(
+            operator.add, self._mean, map(operator.mul, delta, factor)))
+        after = list(map(operator.sub, x, self._mean))
+        self._m2[:] = array(self.typecode, map(
+            operator.add, self._m2, map(operator.mul, delta, after)))
+        if self._comoment is not None:
+            for row, d in zip(self._comoment, delta):
+                row[:] = array(self.typecode, map(
+                    operator.add, row,
+                    map(operator.mul, itertools.repeat(d), after)))
+
+    def update(self, vectors):
+        for vector in vectors:
+            self.add(vector)
+
+    # Exact statistics of a whole chunk: the mean first, then the deviations
+    #   from it, which keeps the sums of squares well conditioned.
+    @classmethod
+    def _fromchunk(cls, batch, covariance):
+        stats = cls(batch.dim, covariance)
+        rows = list(batch._rows())
+        stats.count = len(rows)
+        sums = stats._mean
+        for row in rows:
+            sums[:] = array(cls.typecode, map(operator.add, sums, row))
+        factor = itertools.repeat(1 / stats.count)
+        sums[:] = array(cls.typecode, map(operator.mul, sums, factor))
+        for row in rows:
+            delta = list(map(operator.sub, row, stats._mean))
+            stats._m2[:] = array(cls.typecode, map(
+                operator.add, stats._m2, map(operator.mul, delta, delta)))
+            if covariance:
+                for co_row, d in zip(stats._comoment, delta):
+                    co_row[:] = array(cls.typecode, map(
+                        operator.add, co_row,
+                        map(operator.mul, itertools.repeat(d), delta)))
+        return stats
+
+    # Merges other into self and returns self, so partial accumulators can
+    #   be folded with functools.reduce(VectorStats.merge, shards).
+    def merge(self, other):
+        if not isinstance(other, VectorStats):
+            msg = 'cannot merge {.__name__!r} into VectorStats'
+            raise TypeError(msg.format(type(other)))
+        if other.count == 0:
+            return self
+        if self.track_covariance and other._comoment is None:
+            raise ValueError('cannot merge covariance from an '
+                             'accumulator that does not track it')
+        self._check_dim(other.dim)
+        if self.count == 0:
+            self.count = other.count
+            self._mean[:] = other._mean
+            self._m2[:] = other._m2
+            if self._comoment is not None:
+                for mine, theirs in zip(self._comoment, other._comoment):
+                    mine[:] = theirs
+            return self
+        n_a, n_b = self.count, other.count
+        total = n_a + n_b
+        delta = list(map(operator.sub, other._mean, self._mean))
+        weight = n_a * n_b / total
+        self._mean[:] = array(self.typecode, map(
+            operator.add, self._mean,
+            map(operator.mul, delta, itertools.repeat(n_b / total))))
+        self._m2[:] = array(self.typecode, (
+            a + b + d * d * weight
+            for a, b, d in zip(self._m2, other._m2, delta)))
+        if self._comoment is not None:
+            for mine, theirs, d in zip(self._comoment, other._comoment,
+                                       delta):
+                mine[:] = array(self.typecode, (
+                    a + b + d * e * weight
+                    for a, b, e in zip(mine, theirs, delta)))
+        self.count = total
+        return self
+
+    def _divisor(self, ddof):
+        if self.count <= ddof:
+            msg = 'need more than {} vectors, got {}'
+            raise ValueError(msg.format(ddof, self.count))
+        return self.count - ddof
+
+    @property
+    def mean(self):
+        if not self.count:
+            raise ValueError('mean of an empty VectorStats')
+        return Vector(self._mean)
+
+    # ddof=0 is the population variance, ddof=1 the sample variance.
+    def variance(self, ddof=0):
+        divisor = self._divisor(ddof)
+        return Vector(m2 / divisor for m2 in self._m2)
+
+    # The dim x dim covariance matrix, as a VectorBatch of rows.
+    def covariance(self, ddof=0):
+        if self._comoment is None:
+            raise ValueError('covariance is not tracked; '
+                             'use VectorStats(covariance=True)')
+        divisor = self._divisor(ddof)
+        return VectorBatch.frombuffer(
+            (c / divisor for row in self._comoment for c in row), self.dim)
+
+
+if __name__ == '__main__':
+    rnd = random.Random(0)
+    dim, total = 100, 20000
+    # A large offset with a small spread: the naive sum of squares suffers.
+    vectors = [Vector(1e6 + rnd.random() for _ in range(dim))
+               for _ in range(total)]
+
+    t0 = time.perf_counter()
+    centroid = sum(vectors, Vector([0] * dim)) * (1 / total)
+    chained = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    stats = VectorStats()
+    stats.update(vectors)
+    streamed = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    shards = [VectorStats() for _ in range(4)]
+    for i, shard in enumerate(shards):
+        shard.add(VectorBatch(vectors[i::4]))
+    merged = functools.reduce(VectorStats.merge, shards)
+    chunked = time.perf_counter() - t0
+
+    print('{} vectors of dim {}'.format(total, dim))
+    print('sum() chain mean: {:.3f}s'.format(chained))
+    print('streamed: {:.3f}s, 4 chunks merged: {:.3f}s'.format(streamed,
+                                                               chunked))
+    print('max mean difference: chain {:.3g}, merged {:.3g}'.format(
+          max(map(abs, map(operator.sub, stats.mean, centroid))),
+          max(map(abs, map(operator.sub, stats.mean, merged.mean)))))
+    print('variance[0]: {:.6f} (uniform: {:.6f})'.format(
+          stats.variance()[0], 1 / 12))
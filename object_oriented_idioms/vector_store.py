@@ -0,0 +1,144 @@
+'''
+An append-only, memory-mapped store of Vector instances.
+
+Each record in the data file is exactly bytes(vector): one typecode byte
+followed by the raw components, the format Vector.frombytes already reads.
+Records may mix typecodes, quantized and sparse vectors included.
+A sidecar index file ('<path>.idx') holds the start offset of every record
+as an unsigned 64-bit integer.
+
+VectorStoreWriter appends records. VectorStore reopens both files with mmap,
+so opening a store costs the same no matter how many vectors it holds, and
+store[i] returns a Vector whose components are a memoryview slice of the
+mapping: pages are read from disk only when a vector is actually used.
+'''
+
+from array import array
+import mmap
+import os
+import time
+import tempfile
+
+from vector import Vector, QuantizedVector, SparseVector
+
+
+INDEX_TYPECODE = 'Q'
+
+
+def index_path(path):
+    return path + '.idx'
+
+
+class VectorStoreWriter:
+
+    def __init__(self, path):
+        # Append mode: reopening an existing store adds records after the
+        #   ones already there.
+        self._data = open(path, 'ab')
+        self._index = open(index_path(path), 'ab')
+        self._offset = self._data.tell()
+
+    def append(self, vector):
+        if not isinstance(vector, (Vector, QuantizedVector, SparseVector)):
+            vector = Vector(vector)
+        record = bytes(vector)
+        self._data.write(record)
+        # The data goes first, so an index entry never points past the end
+        #   of the data file.
+        self._index.write(array(INDEX_TYPECODE, [self._offset]))
+        self._offset += len(record)
+
+    def extend(self, vectors):
+        for vector in vectors:
+            self.append(vector)
+
+    def flush(self):
+        self._data.flush()
+        self._index.flush()
+
+    def close(self):
+        self._data.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.close()
+
+
+class VectorStore:
+
+    def __init__(self, path):
+        self.path = path
+        self._data, data_map = self._map(path)
+        self._index, index_map = self._map(index_path(path))
+        self._data_map = data_map
+        self._index_map = index_map
+        if index_map is None:
+            self._offsets = ()
+        else:
+            self._offsets = memoryview(index_map).cast(INDEX_TYPECODE)
+        self._end = len(data_map) if data_map is not None else 0
+
+    # mmap refuses empty files, so an empty store has no mapping at all.
+    @staticmethod
+    def _map(path):
+        fp = open(path, 'rb')
+        if os.fstat(fp.fileno()).st_size == 0:
+            return fp, None
+        return fp, mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __getitem__(self, index):
+        try:
+            start = self._offsets[index]
+        except IndexError:
+            msg = '{.__name__} index out of range'
+            raise IndexError(msg.format(type(self))) from None
+        index = range(len(self))[index]
+        if index + 1 < len(self):
+            end = self._offsets[index + 1]
+        else:
+            end = self._end
+        record = memoryview(self._data_map)[start:end]
+        return Vector.frombytes(record, copy=False)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    # The mappings can only be closed once no Vector obtained from the
+    #   store is alive any more: mmap raises BufferError otherwise.
+    def close(self):
+        if self._index_map is not None:
+            self._offsets.release()
+            self._index_map.close()
+        if self._data_map is not None:
+            self._data_map.close()
+        self._data.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.close()
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp:
+        for total in (1000, 100000):
+            path = os.path.join(tmp, 'vectors{}.bin'.format(total))
+            with VectorStoreWriter(path) as writer:
+                writer.extend(Vector([i] * 100) for i in range(total))
+
+            t0 = time.perf_counter()
+            store = VectorStore(path)
+            elapsed = time.perf_counter() - t0
+            v = store[-1]
+            print('{} vectors, opened in {:.6f}s, last: {!r}'.format(
+                  len(store), elapsed, v))
+            del v
+            store.close()
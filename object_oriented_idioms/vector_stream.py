@@ -0,0 +1,183 @@
+'''
+Streaming many Vectors to and from a binary file.
+
+bytes(vector) holds exactly one vector and carries no length, so a file of
+concatenated records can't be read back without knowing where each one ends.
+dump_many() writes a small header followed by the raw components:
+
+    magic     4 bytes   b'VECS'
+    flags     1 byte    bit 0 set: records are framed
+    typecode  1 byte    'f' or 'd', shared by all the records
+    dim       8 bytes   components per record, 0 when framed
+    count     8 bytes   number of records, UNKNOWN_COUNT if not known
+
+All integers are in native byte order, as in bytes(vector). Without framing
+every record is dim components; with framed=True each record is prefixed with
+its own 8-byte length, so vectors of different lengths can share a file.
+
+iter_load() reads the file in large chunks with readinto() into one reusable
+buffer, and builds every Vector straight from a memoryview slice of that
+buffer: loading a huge file creates no bytes object per record.
+
+    >>> import io
+    >>> fp = io.BytesIO()
+    >>> dump_many([Vector([1, 2]), Vector([3, 4])], fp)
+    2
+    >>> fp.seek(0)
+    0
+    >>> list(iter_load(fp))
+    [Vector([1.0, 2.0]), Vector([3.0, 4.0])]
+'''
+
+import itertools
+import struct
+import time
+import tempfile
+
+from vector import Vector, TYPECODES
+
+
+MAGIC = b'VECS'
+FRAMED = 0x01
+HEADER = struct.Struct('=4sBcQQ')
+FRAME = struct.Struct('=Q')
+# Written when the vectors have no len() and the file can't be rewound to
+#   patch the header; the reader then stops at end of file.
+UNKNOWN_COUNT = 2 ** 64 - 1
+CHUNK_SIZE = 1 << 20
+
+
+def dump_many(vectors, fp, typecode=None, framed=False):
+    '''Write vectors to the binary file fp; return the number written.'''
+    count = len(vectors) if hasattr(vectors, '__len__') else UNKNOWN_COUNT
+    vectors = iter(vectors)
+    first = next(vectors, None)
+    if typecode is None:
+        typecode = getattr(first, 'typecode', Vector.typecode)
+    if typecode not in TYPECODES:
+        msg = 'typecode must be one of {!r}, not {!r}'
+        raise ValueError(msg.format(TYPECODES, typecode))
+    if first is not None and not isinstance(first, Vector):
+        first = Vector(first, typecode)
+    dim = 0 if framed or first is None else len(first)
+    header_pos = fp.tell() if fp.seekable() else None
+    fp.write(HEADER.pack(MAGIC, FRAMED if framed else 0,
+                         typecode.encode(), dim, count))
+    written = 0
+    if first is not None:
+        for vector in itertools.chain([first], vectors):
+            if not isinstance(vector, Vector) or vector.typecode != typecode:
+                vector = Vector(vector, typecode)
+            if framed:
+                fp.write(FRAME.pack(len(vector)))
+            elif len(vector) != dim:
+                msg = 'record {} has length {}, expected {}; use framed=True'
+                raise ValueError(msg.format(written, len(vector), dim))
+            components = memoryview(vector._components)
+            # Slices of a Vector can be strided views.
+            fp.write(components if components.contiguous
+                     else components.tobytes())
+            written += 1
+    if count == UNKNOWN_COUNT and header_pos is not None:
+        end = fp.tell()
+        fp.seek(header_pos + HEADER.size - FRAME.size)
+        fp.write(FRAME.pack(written))
+        fp.seek(end)
+    elif count not in (UNKNOWN_COUNT, written):
+        msg = 'len() reported {} vectors, {} were written'
+        raise ValueError(msg.format(count, written))
+    return written
+
+
+class _ChunkReader:
+    '''Hands out memoryview slices of a bytearray refilled with readinto().'''
+
+    def __init__(self, fp, chunk_size=CHUNK_SIZE):
+        self._fp = fp
+        self._buf = bytearray(chunk_size)
+        self._view = memoryview(self._buf)
+        self._start = self._end = 0
+
+    def _fill(self, size):
+        if len(self._buf) - self._start < size:
+            # Move the unread tail to the front, and grow the buffer if a
+            #   single record is larger than it.
+            pending = self._end - self._start
+            self._view[:pending] = self._view[self._start:self._end]
+            self._start, self._end = 0, pending
+            if len(self._buf) < size:
+                self._view.release()
+                self._buf.extend(bytes(size - len(self._buf)))
+                self._view = memoryview(self._buf)
+        while self._end - self._start < size:
+            with self._view[self._end:] as free:
+                received = self._fp.readinto(free)
+            if not received:
+                return False
+            self._end += received
+        return True
+
+    # The slice must be released before the next call to take().
+    def take(self, size):
+        if not self._fill(size):
+            msg = 'stream truncated: expected {} more bytes, got {}'
+            raise EOFError(msg.format(size, self._end - self._start))
+        start = self._start
+        self._start += size
+        return self._view[start:self._start]
+
+    def at_eof(self):
+        return not self._fill(1)
+
+
+def iter_load(fp, chunk_size=CHUNK_SIZE):
+    '''Yield the Vectors written by dump_many() to the binary file fp.'''
+    reader = _ChunkReader(fp, chunk_size)
+    with reader.take(HEADER.size) as header:
+        magic, flags, typecode, dim, count = HEADER.unpack(header)
+    typecode = typecode.decode()
+    if magic != MAGIC:
+        raise ValueError('not a vector stream: bad magic {!r}'.format(magic))
+    if flags & ~FRAMED or typecode not in TYPECODES:
+        msg = 'unsupported vector stream: flags {:#x}, typecode {!r}'
+        raise ValueError(msg.format(flags, typecode))
+    itemsize = struct.calcsize(typecode)
+    loaded = 0
+    while loaded != count:
+        if count == UNKNOWN_COUNT and reader.at_eof():
+            return
+        if flags & FRAMED:
+            with reader.take(FRAME.size) as frame:
+                dim, = FRAME.unpack(frame)
+        # The Vector is built, copying the components once, before the
+        #   slice is released and the buffer can be reused.
+        with reader.take(dim * itemsize) as record:
+            with record.cast(typecode) as components:
+                vector = Vector(components)
+        yield vector
+        loaded += 1
+
+
+if __name__ == '__main__':
+    total, dim = 100000, 100
+    vectors = [Vector(range(i, i + dim)) for i in range(total)]
+    with tempfile.TemporaryFile() as fp:
+        t0 = time.perf_counter()
+        dump_many(vectors, fp)
+        elapsed = time.perf_counter() - t0
+        size = fp.tell()
+        print('{} vectors of dim {}: {:.1f} MB written in {:.3f}s'.format(
+              total, dim, size / 2 ** 20, elapsed))
+
+        fp.seek(0)
+        t0 = time.perf_counter()
+        loaded = sum(1 for _ in iter_load(fp))
+        elapsed = time.perf_counter() - t0
+        print('{} vectors loaded in {:.3f}s'.format(loaded, elapsed))
+
+        # Framed records of mixed lengths, from a generator with no len().
+        fp.seek(0)
+        fp.truncate()
+        dump_many((Vector(range(n)) for n in range(5)), fp, framed=True)
+        fp.seek(0)
+        print(list(iter_load(fp)))